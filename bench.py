@@ -0,0 +1,138 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from nationwide_parser.account import Account, merge_many
+from nationwide_parser.ledger import RenderCache, write_ledger
+from nationwide_parser.statement import read_nationwide_file
+from nationwide_parser.synthetic import day_start, generate_transactions, write_midata_statement, write_nationwide_statement
+from nationwide_parser.transaction import TransactionTable
+
+
+# parse args
+arg_parser = argparse.ArgumentParser(
+        description="Benchmark parsing, merging and ledger generation on synthetic statements.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+        )
+arg_parser.add_argument("-n", "--rows", type=int, default=100000, help="Number of transactions per synthetic statement")
+arg_parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of timed runs of each benchmark; the fastest is reported")
+arg_parser.add_argument("-o", "--output", help="Save results to this JSON file")
+arg_parser.add_argument("-k", "--filter", default="", help="Only run benchmarks whose name contains this")
+
+argv = arg_parser.parse_args()
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _add_one_by_one(statements):
+    account = Account("****12345", list(statements[0]))
+    for statement in statements[1:]:
+        account.add_unique_transactions(statement)
+    return account
+
+def run_benchmark(name, rows, setup, func):
+    """Time func(setup()) over several runs, then run it once more under
+    tracemalloc to find its peak memory use"""
+
+    times = []
+    for _ in range(argv.repeat):
+        arg = setup()
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+
+    arg = setup()
+    tracemalloc.start()
+    func(arg)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    result = {
+            "name": name,
+            "rows": rows,
+            "seconds": best,
+            "rows_per_second": rows / best if best > 0 else None,
+            "peak_memory_bytes": peak_memory,
+            }
+    print(f"{name:<45} {best:>9.4f}s {result['rows_per_second'] or 0:>12,.0f} rows/s {peak_memory / 1024 / 1024:>9.1f} MiB", flush=True)
+    return result
+
+def main():
+    benchmarks = []
+    def benchmark(name, rows, setup, func):
+        if argv.filter in name:
+            benchmarks.append((name, rows, setup, func))
+
+    work_dir = tempfile.mkdtemp(prefix="nationwide-bench-")
+    transactions = generate_transactions(argv.rows)
+
+    # parsing
+    nationwide_file = os.path.join(work_dir, "statement.csv")
+    midata_file = os.path.join(work_dir, "midata.csv")
+    write_nationwide_statement(nationwide_file, "****12345", transactions)
+    write_midata_statement(midata_file, "****12345", transactions)
+
+    benchmark("read_nationwide_file[nationwide]", argv.rows, lambda: None, lambda _: read_nationwide_file(nationwide_file))
+    benchmark("read_nationwide_file[midata]", argv.rows, lambda: None, lambda _: read_nationwide_file(midata_file))
+
+    # merging a statement which overlaps the end of an account by some fraction
+    split = day_start(transactions, argv.rows // 2)
+    for overlap in (0, 10, 50, 90):
+        new_start = day_start(transactions, split - split * overlap // 100)
+        benchmark(
+                f"add_unique_transactions[{overlap}% overlap]",
+                argv.rows,
+                lambda new_start=new_start: (Account("****12345", transactions[:split]), transactions[new_start:]),
+                lambda arg: arg[0].add_unique_transactions(arg[1]),
+                )
+
+    # merging many overlapping statements at once
+    num_statements = 50
+    starts = [day_start(transactions, i * argv.rows // num_statements) for i in range(num_statements)]
+    statements = [transactions[start:day_start(transactions, min(argv.rows - 1, start + 3 * argv.rows // num_statements))] for start in starts]
+    statements[-1] = transactions[starts[-1]:]
+    benchmark(f"add_unique_transactions[{num_statements} statements]", argv.rows, lambda: None, lambda _: _add_one_by_one(statements))
+    benchmark(f"merge_many[{num_statements} statements]", argv.rows, lambda: None, lambda _: merge_many(statements))
+    benchmark(f"add_unique_transactions[{num_statements} statements,reversed]", argv.rows, lambda: None, lambda _: _add_one_by_one(statements[::-1]))
+    benchmark(f"merge_many[{num_statements} statements,reversed]", argv.rows, lambda: None, lambda _: merge_many(statements[::-1]))
+
+    # continuity
+    benchmark("all_transactions_are_continuous[list]", argv.rows, lambda: Account("****12345", list(transactions)), lambda account: account.all_transactions_are_continuous())
+    benchmark("all_transactions_are_continuous[table]", argv.rows, lambda: Account("****12345", TransactionTable(transactions)), lambda account: account.all_transactions_are_continuous())
+    benchmark("gaps[table]", argv.rows, lambda: Account("****12345", TransactionTable(transactions)), lambda account: account.gaps())
+
+    # rendering
+    ledger_file = os.path.join(work_dir, "generated.beancount")
+    benchmark("write_ledger", argv.rows, lambda: {"****12345": Account("****12345", transactions)}, lambda accounts: write_ledger(ledger_file, accounts))
+    # rewriting a ledger whose transactions have all been rendered before, as in watch mode
+    render_cache = RenderCache()
+    write_ledger(ledger_file, {"****12345": Account("****12345", transactions)}, render_cache=render_cache)
+    benchmark("write_ledger[cached]", argv.rows, lambda: {"****12345": Account("****12345", transactions)}, lambda accounts: write_ledger(ledger_file, accounts, render_cache=render_cache))
+
+    results = [run_benchmark(*b) for b in benchmarks]
+
+    shutil.rmtree(work_dir)
+
+    if argv.output:
+        with open(argv.output, "w") as f:
+            json.dump({
+                "commit": _commit(),
+                "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "rows": argv.rows,
+                "results": results,
+                }, f, indent=1)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,20 @@
 import argparse
-import datetime
+import json
 import logging
 import os
 import sys
 
-from nationwide_parser.statement import StatementParseError, read_nationwide_file
-from nationwide_parser.account import Account
-from nationwide_parser.utils import decimalise
+from nationwide_parser.account import load_accounts, save_accounts
+from nationwide_parser.cache import DEFAULT_CACHE_DIR, StatementCache
+from nationwide_parser.export import EXPORT_FORMATS, export_accounts
+from nationwide_parser.gap_report import format_gap_table, gap_report_json
+from nationwide_parser.ingest import find_duplicate_files, find_statements, read_statements
+from nationwide_parser.ledger import RenderCache, update_ledger, write_ledger
+from nationwide_parser.pipeline import merge_accounts
+from nationwide_parser.statement import UnrecognisedFileError
+from nationwide_parser.stats import STATS
+from nationwide_parser.transaction import TransactionTable
+from nationwide_parser.watch import DEFAULT_INTERVAL, StatementWatcher, watch_statements
 
 
 # parse args
@@ -15,96 +23,196 @@ arg_parser = argparse.ArgumentParser(
         formatter_class=argparse.ArgumentDefaultsHelpFormatter
         )
 arg_parser.add_argument("-v", "--verbose", action="store_true")
-arg_parser.add_argument("-o", "--output", default="generated.beancount", help="Output ledger file name")
+arg_parser.add_argument("-o", "--output", help="Output file name, or - for stdout; generated.beancount by default, with the extension of the output format")
+arg_parser.add_argument("--format", choices=["beancount", *EXPORT_FORMATS], default="beancount", help="Output format: a Beancount ledger, CSV, JSON Lines or the columnar binary format of --store")
+arg_parser.add_argument("-i", "--incremental", action="store_true", help="Only append new transactions to the output ledger where possible, tracking what it contains in a .state file alongside it")
+arg_parser.add_argument("-r", "--recursive", action="store_true", help="Search directories recursively for statements")
+arg_parser.add_argument("--include", action="append", default=[], metavar="PATTERN", help="Only read files in directories whose names match this glob pattern; may be given more than once")
+arg_parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN", help="Skip files in directories whose names match this glob pattern; may be given more than once")
+arg_parser.add_argument("--prefetch", type=int, default=4, help="Number of files to read ahead while parsing, to hide filesystem latency; 0 to disable")
+arg_parser.add_argument("-j", "--jobs", type=int, default=1, help="Number of worker processes to parse statements and merge accounts with")
+arg_parser.add_argument("--compact", action="store_true", help="Hold transactions in compact columnar tables to reduce memory use")
+arg_parser.add_argument("--cache", action="store_true", help="Cache parsed statements so unchanged files aren't parsed again")
+arg_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory to cache parsed statements in")
+arg_parser.add_argument("--cache-size", type=int, default=256, help="Maximum size of the statement cache in MiB")
+arg_parser.add_argument("--store", help="Load previously parsed accounts from this file and save them back with any new transactions; files ending .db, .sqlite or .sqlite3 are SQLite databases")
+arg_parser.add_argument("--gap-report", help="Write a report of every gap in each account's transactions to this file, or - for stdout")
+arg_parser.add_argument("--gap-report-format", choices=["table", "json"], default="table", help="Format of the gap report")
+arg_parser.add_argument("--write-buffer", type=int, default=1024, help="Amount of rendered ledger text to buffer between writes in KiB")
+arg_parser.add_argument("--profile", action="store_true", help="Log the time spent in each stage, event counts and the slowest statements to parse at the end of the run")
+arg_parser.add_argument("--stats-json", metavar="FILE", help="Save the time spent in each stage, event counts and per-statement parse times to this JSON file")
+arg_parser.add_argument("--watch", action="store_true", help="Keep running after the ledger is written, watching for new statements and updating the ledger incrementally as they arrive")
+arg_parser.add_argument("--watch-interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between checks for new statements when watching")
 arg_parser.add_argument("infiles", nargs="*")
 
 argv = arg_parser.parse_args()
+if argv.output is None:
+    argv.output = "generated.beancount" if argv.format == "beancount" else f"generated.{EXPORT_FORMATS[argv.format].extension}"
+if argv.format != "beancount" and (argv.incremental or argv.watch):
+    arg_parser.error("only beancount ledgers can be updated incrementally or watched")
+if argv.incremental and argv.output == "-":
+    arg_parser.error("cannot update a ledger written to stdout incrementally")
+if argv.watch and argv.output == "-":
+    arg_parser.error("cannot watch for statements while writing the ledger to stdout")
+if argv.output == "-" and argv.gap_report == "-":
+    arg_parser.error("cannot write both the ledger and the gap report to stdout")
 
 # setup
 logger = logging.getLogger("main")
+log_stream = sys.stderr if "-" in (argv.output, argv.gap_report) else sys.stdout
 if argv.verbose:
-    logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
+    logging.basicConfig(stream=log_stream, level=logging.DEBUG)
 else:
-    logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+    logging.basicConfig(stream=log_stream, level=logging.INFO)
 
 def main():
     logger.info("Starting...")
 
-    statements = []
-    for arg in argv.infiles:
-        if os.path.isdir(arg):
-            new_filenames = [os.path.join(arg, f) for f in os.listdir(arg)]
-            new_filepaths = [f for f in new_filenames if not os.path.isdir(f)]
-            statements.extend(new_filepaths)
-        elif os.path.isfile(arg):
-            statements.append(arg)
+    watcher = None
+    with STATS.timer("discovery"):
+        if argv.watch:
+            watcher = StatementWatcher(argv.infiles, argv.recursive, argv.include, argv.exclude)
+            statements = watcher.poll()
         else:
-            logger.warning(f"{arg} is not a file")
-    if statements == []:
+            statements = find_statements(argv.infiles, argv.recursive, argv.include, argv.exclude)
+    accounts = {}
+    if argv.store is not None and os.path.exists(argv.store):
+        with STATS.timer("store_load"):
+            accounts = load_accounts(argv.store)
+        logger.info(f"Loaded {len(accounts)} accounts from {argv.store}")
+
+    if statements == [] and accounts == {} and watcher is None:
         logger.info("Nothing to do")
         sys.exit(0)
 
     logger.debug(f"Found statements {statements}")
 
+    with STATS.timer("deduplication"):
+        duplicates = find_duplicate_files(statements)
+    if duplicates:
+        for duplicate, original in duplicates.items():
+            logger.debug(f"Skipping {duplicate}, which is identical to {original}")
+        logger.info(f"Skipped {len(duplicates)} {'file' if len(duplicates) == 1 else 'files'} identical to another")
+        STATS.count("duplicate_files", len(duplicates))
+        statements = [statement for statement in statements if statement not in duplicates]
+
     # collect observed accounts
     num_statements = len(statements)
     successful_reads = 0
-    accounts = {}
-
-    for statement in statements:
-        try:
-            account_name, transactions = read_nationwide_file(statement)
-            successful_reads += 1
-            logger.info(f"Read {len(transactions)} transactions for account {account_name}")
-            if account_name in accounts:
-                accounts[account_name].add_unique_transactions(transactions)
-            else:
-                accounts[account_name] = Account(account_name, transactions)
-        except StatementParseError as e:
-            logger.warning(e)
-
-    if successful_reads == 0:
+    num_skipped = 0
+    # transactions and (first_date, last_date, file) of each statement read, by account
+    new_statements = {}
+    statement_windows = {}
+
+    cache = StatementCache(argv.cache_dir, argv.cache_size * 1024 * 1024) if argv.cache else None
+
+    for statement, result in read_statements(statements, argv.jobs, cache, argv.prefetch):
+        if isinstance(result, UnrecognisedFileError):
+            logger.debug(f"Skipping {statement}: {result}")
+            num_skipped += 1
+            continue
+        elif isinstance(result, Exception):
+            logger.warning(result)
+            continue
+
+        account_name, transactions = result
+        if argv.compact:
+            transactions = TransactionTable(transactions)
+        successful_reads += 1
+        logger.info(f"Read {len(transactions)} transactions for account {account_name}")
+        if len(transactions) > 0:
+            statement_windows.setdefault(account_name, []).append((transactions[0].date, transactions[-1].date, statement))
+
+        # statements merged into the store before have nothing to add
+        if account_name in accounts and accounts[account_name].covers(transactions):
+            logger.debug(f"Skipping merging {statement}, which is already in account {account_name}")
+            STATS.count("statements_covered")
+            continue
+        new_statements.setdefault(account_name, []).append(transactions)
+
+    if cache is not None:
+        logger.debug(f"Statement cache: {cache.hits} hits, {cache.misses} misses")
+        STATS.count("cache_hits", cache.hits)
+        STATS.count("cache_misses", cache.misses)
+        cache.close()
+
+    if successful_reads == 0 and accounts == {} and watcher is None:
         logger.info(f"Could not parse any input files.")
         return
 
+    if num_skipped > 0:
+        skipped = "file which isn't a statement" if num_skipped == 1 else "files which aren't statements"
+        logger.info(f"Skipped {num_skipped} {skipped}")
+        num_statements -= num_skipped
+
     if successful_reads == num_statements:
         msg = f"Parsed all {num_statements} files successfully, with the following results:"
     else:
         msg = f"Parsed {successful_reads}/{num_statements} files successfully, with the following results:"
     logger.info(msg)
 
-    # beancount
-    f = open(argv.output, "w")
-    f.write("""option "operating_currency" "GBP"
-
-2000-01-01 open Income:Unknown
-2000-01-01 open Expenses:Unknown
-2000-01-01 open Equity:Opening-Balances
-
-""")
-
-    for x in accounts:
-        logger.info(f"Account {x}: {len(accounts[x].transactions)} {'complete' if accounts[x].all_transactions_are_continuous() else 'incomplete'} transactions from {accounts[x].transactions[0].date} to {accounts[x].transactions[-1].date}")
-        bc_name = f"Assets:{x.removeprefix('****')}"
-        f.write(f"2000-01-01 open {bc_name}\n")
-
-        # TODO: are accounts with no transactions possible?
-        first_txn = accounts[x].transactions[0]
-        opening_balance = first_txn.closing_balance - first_txn.amount
-        if opening_balance != 0:
-            f.write(f"""2000-01-01 pad {bc_name} Equity:Opening-Balances
-{first_txn.date.isoformat()} balance {bc_name} {decimalise(opening_balance)} GBP
-""")
-
-        for t in accounts[x].transactions:
-            f.write("\n")
-            f.write(t.to_beancount(bc_name))
-        f.write(f"""
-{(t.date + datetime.timedelta(days=1)).isoformat()} balance {bc_name} {decimalise(t.closing_balance)} GBP
+    # merge, check and render each account, in parallel if there are jobs to spare
+    render = argv.jobs > 1 and not argv.incremental and watcher is None and argv.format == "beancount"
+    merged_accounts = {}
+    reports = []
+    rendered = {}
+    for account, report, section in merge_accounts(accounts, new_statements, statement_windows, argv.jobs, render):
+        x = account.name
+        merged_accounts[x] = account
+        reports.append(report)
+        if section is not None:
+            rendered[x] = section
+        if len(account.transactions) == 0:
+            # only possible for accounts loaded from a store
+            logger.info(f"Account {x}: no transactions")
+            continue
+        logger.info(f"Account {x}: {len(account.transactions)} {'complete' if report.is_complete() else 'incomplete'} transactions from {account.transactions[0].date} to {account.transactions[-1].date}")
+        if not report.is_complete():
+            logger.info(f"Account {x} is complete from {', '.join(f'{segment.first_date} to {segment.last_date}' for segment in report.segments)}")
+    accounts = merged_accounts
+
+    if argv.store is not None:
+        with STATS.timer("store_save"):
+            save_accounts(argv.store, accounts)
+        logger.debug(f"Saved {len(accounts)} accounts to {argv.store}")
+
+    if argv.gap_report is not None:
+        report = gap_report_json(reports) if argv.gap_report_format == "json" else format_gap_table(reports)
+        if argv.gap_report == "-":
+            sys.stdout.write(report)
+        else:
+            with open(argv.gap_report, "w") as f:
+                f.write(report)
+
+    # output
+    buffer_size = argv.write_buffer * 1024
+    # when watching, keep what's rendered for whenever the ledger is rewritten
+    render_cache = RenderCache() if watcher is not None else None
+    with STATS.timer("write"):
+        if argv.format != "beancount":
+            export_accounts(argv.output, accounts, argv.format)
+        elif argv.incremental or watcher is not None:
+            update_ledger(argv.output, accounts, buffer_size=buffer_size, render_cache=render_cache)
+        else:
+            write_ledger(argv.output, accounts, buffer_size=buffer_size, rendered=rendered)
 
-""")
+    if watcher is not None:
+        logger.info(f"Watching for new statements every {argv.watch_interval}s")
+        try:
+            watch_statements(watcher, accounts, argv.output, argv.watch_interval, argv.jobs, argv.prefetch, argv.compact, buffer_size, argv.store, render_cache)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
 
-    f.close()
+def report_stats():
+    if argv.profile:
+        log_stream.write(STATS.format_table())
+    if argv.stats_json is not None:
+        with open(argv.stats_json, "w") as f:
+            json.dump(STATS.to_dict(), f, indent=1)
 
 if __name__ == "__main__":
-    main()
+    try:
+        with STATS.timer("total"):
+            main()
+    finally:
+        report_stats()
@@ -1,5 +1,11 @@
+import bisect
 import logging
+import operator
 
+from nationwide_parser import store
+from nationwide_parser.continuity import iter_breaks
+from nationwide_parser.stats import STATS
+from nationwide_parser.transaction import TransactionTable, transaction_columns
 
 logger = logging.getLogger(__name__)
 
@@ -10,27 +16,151 @@ class InconsistentTransactionsError(Exception):
 
 class Account:
     """An account consisting of a name and a chronological list of
-    Transactions"""
+    Transactions, which may be a TransactionTable to save memory"""
 
     def __init__(self, name, transactions=[]):
         self.name = name
         self.transactions = transactions
 
+        # set of (date, amount, closing_balance), built when first needed
+        self._transaction_keys = None
+        self._transaction_keys_of = None
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def load(cls, path, name, start=None, end=None):
+        """Load an account from a store, optionally only with transactions
+        dated from start to end inclusive"""
+
+        named_transactions = store.read_store(path, start, end, names=[name])
+        if name not in named_transactions:
+            raise KeyError(f"No account {name} in {path}")
+        return cls(name, named_transactions[name])
+
+    @classmethod
+    def from_statements(cls, name, statements):
+        """Create an account from many chronological lists of transactions at
+        once, as if adding each in turn with add_unique_transactions but much
+        faster. See merge_many."""
+
+        transactions = merge_many(statements)
+        if len(statements) > 0 and isinstance(statements[0], TransactionTable) and not isinstance(transactions, TransactionTable):
+            transactions = TransactionTable(transactions)
+        return cls(name, transactions)
+
+    def save(self, path):
+        """Save this account alone to a store"""
+
+        store.write_store(path, {self.name: self.transactions})
+
+    def _bisect_date(self, date, right=False):
+        """Return the index of the first transaction on or after date, or
+        after date if right is set"""
+
+        if isinstance(self.transactions, TransactionTable):
+            dates = self.transactions.dates
+            date = date.toordinal()
+            key = None
+        else:
+            dates = self.transactions
+            key = operator.attrgetter("date")
+
+        if right:
+            return bisect.bisect_right(dates, date, key=key)
+        return bisect.bisect_left(dates, date, key=key)
+
+    def balance_on(self, date):
+        """Return the balance at the end of date, or None if date is before
+        the account's first transaction"""
+
+        i = self._bisect_date(date, right=True)
+        if i == 0:
+            return None
+        return self.transactions[i - 1].closing_balance
+
+    def transactions_between(self, start, end):
+        """Return the transactions dated from start to end inclusive"""
+
+        return self.transactions[self._bisect_date(start):self._bisect_date(end, right=True)]
+
+    def contains(self, transaction):
+        """Return whether the account has a transaction equivalent to
+        transaction, as per Transaction.is_equivalent_to"""
+
+        # rebuild the set whenever the transactions have visibly changed
+        snapshot = (id(self.transactions), len(self.transactions))
+        if self._transaction_keys is None or self._transaction_keys_of != snapshot:
+            self._transaction_keys = set(zip(*transaction_columns(self.transactions)))
+            self._transaction_keys_of = snapshot
+
+        if isinstance(self.transactions, TransactionTable):
+            key = (transaction.date.toordinal(), transaction.amount, transaction.closing_balance)
+        else:
+            key = (transaction.date, transaction.amount, transaction.closing_balance)
+        return key in self._transaction_keys
+
+    def covers(self, transactions):
+        """Return whether a chronological statement would add nothing to the
+        account: its first and last transactions are in the account, with
+        nothing missing between them.
+
+        Only the statement's window and endpoint balances are checked, so a
+        statement which disagrees with the account in between isn't noticed.
+        This is meant for skipping statements which have been merged before."""
+
+        if len(transactions) == 0:
+            return True
+        if not (self.contains(transactions[0]) and self.contains(transactions[-1])):
+            return False
+
+        window = self.transactions_between(transactions[0].date, transactions[-1].date)
+        return next(iter_breaks(*transaction_columns(window)), None) is None
+
+    def _check_break(self, i, dates):
+        """Raise InconsistentTransactionsError unless the break before
+        transaction i could just be missing transactions"""
+
+        if dates[i] <= dates[i - 1]:
+            # transactions should agree, therefore something is wrong
+            raise InconsistentTransactionsError(f"{self.transactions[i]} cannot follow {self.transactions[i - 1]}")
+
     def all_transactions_are_continuous(self):
-        for i in range(1, len(self.transactions)):
-            if self.transactions[i].succeeds(self.transactions[i - 1]):
-                continue
-            elif self.transactions[i].date > self.transactions[i - 1].date:
-                # some transactions may just be missing
-                return False
-            else:
-                # transactions should agree, therefore something is wrong
-                raise InconsistentTransactionsError(f"{self.transactions[i]} cannot follow {self.transactions[i - 1]}")
+        dates, amounts, closing_balances = transaction_columns(self.transactions)
+
+        for i in iter_breaks(dates, amounts, closing_balances):
+            self._check_break(i, dates)
+            # some transactions may just be missing
+            return False
         return True
 
+    def gaps(self):
+        """Return the index of every transaction which doesn't follow the one
+        before it, i.e. where some transactions are missing.
+
+        Raises InconsistentTransactionsError if any break in the chain of
+        balances isn't between two different dates."""
+
+        dates, amounts, closing_balances = transaction_columns(self.transactions)
+
+        gaps = []
+        for i in iter_breaks(dates, amounts, closing_balances):
+            self._check_break(i, dates)
+            gaps.append(i)
+        return gaps
+
+    def complete_ranges(self):
+        """Return (first_date, last_date) for each run of transactions with
+        nothing missing"""
+
+        if len(self.transactions) == 0:
+            return []
+
+        starts = [0] + self.gaps()
+        ends = starts[1:] + [len(self.transactions)]
+        return [(self.transactions[start].date, self.transactions[end - 1].date) for start, end in zip(starts, ends)]
+
     """Add only new transactions to account, returning how many were
     added"""
     def add_unique_transactions(self, new_transactions):
@@ -38,77 +168,251 @@ class Account:
             logger.warning("Attempt to insert own transactions into self detected; aborting")
             return 0
 
-        if new_transactions == []:
+        if len(new_transactions) == 0:
             logger.debug("new_transactions empty; nothing to do")
             return 0
 
-        logger.debug(f"New transactions window: {new_transactions[0].date} -> {new_transactions[-1].date} ")
+        logger.debug("New transactions window: %s -> %s ", new_transactions[0].date, new_transactions[-1].date)
+        STATS.count("merges")
 
-        if self.transactions == []:
-            logger.debug(f"{self.name} had no transactions; adding all {len(new_transactions)} new transactions")
+        if len(self.transactions) == 0:
+            logger.debug("%s had no transactions; adding all %s new transactions", self.name, len(new_transactions))
             self.transactions = new_transactions
             return len(new_transactions)
 
-        # prep
-        old_transactions_length = len(self.transactions)
-        old_transactions_start = self.transactions[0].date
-        old_transactions_end = self.transactions[-1].date
-        new_transactions_length = len(new_transactions)
-        new_transactions_start = new_transactions[0].date
-        new_transactions_end = new_transactions[-1].date
-
-        unique_transaction_indexes = [] # list of tuples (index of self.transactions where to insert, index of transaction in new_transactions)
-        old_i = new_i = 0
-
-        # easy cases where transactions do not overlap
-        if new_transactions_end < old_transactions_start:
-            logger.debug(f"All {len(new_transactions)} predate the existing transactions; prepending them all")
-            new_transactions.extend(self.transactions)
-            self.transactions = new_transactions
+        # easy cases where transactions do not overlap, which can be done in place
+        if new_transactions[-1].date < self.transactions[0].date:
+            logger.debug("All %s predate the existing transactions; prepending them all", len(new_transactions))
+            self.transactions[:0] = new_transactions
+            self._transaction_keys = None
             return len(new_transactions)
 
-        if new_transactions_start > old_transactions_end:
-            logger.debug(f"All {len(new_transactions)} postdate the existing transactions; appending them all")
+        if new_transactions[0].date > self.transactions[-1].date:
+            logger.debug("All %s postdate the existing transactions; appending them all", len(new_transactions))
             self.transactions.extend(new_transactions)
+            self._transaction_keys = None
+            return len(new_transactions)
+
+        # transactions DO overlap - only merge from where the new transactions start
+        overlap_start = self._bisect_date(new_transactions[0].date)
+        if new_transactions[-1].date < self.transactions[overlap_start].date:
+            logger.debug("All %s fall in a gap in the existing transactions; inserting them all", len(new_transactions))
+            self.transactions[overlap_start:overlap_start] = new_transactions
+            self._transaction_keys = None
             return len(new_transactions)
 
-        # transactions DO overlap - skip through early non-overlapping transactions
-        if old_transactions_start < new_transactions_start:
-            while self.transactions[old_i].date < new_transactions_start:
-                old_i += 1
-            logger.debug(f"Skipped over {old_i} earlier old transactions")
-        elif new_transactions_start < old_transactions_start:
-            while new_transactions[new_i].date < old_transactions_start:
-                unique_transaction_indexes.insert(0, (0, new_i))
-                new_i += 1
-            logger.debug(f"Marked {new_i} earlier new transactions for insertion")
-
-        # compare overlapping transactions
-        # loop ends when we run out of old or new transactions to compare
-        while new_i < new_transactions_length and old_i < old_transactions_length:
-            if new_transactions[new_i].is_equivalent_to(self.transactions[old_i]):
-                # transactions match, nothing to do
-                old_i += 1
-                new_i += 1
+        merged_transactions, num_added = merge_transactions(self.transactions[overlap_start:], new_transactions)
+        del self.transactions[overlap_start:]
+        self.transactions.extend(merged_transactions)
+        self._transaction_keys = None
+
+        logger.debug("Merged %s/%s transactions into account %s", num_added, len(new_transactions), self.name)
+        return num_added
+
+def load_accounts(path, start=None, end=None):
+    """Load a dict of Accounts from a store written by save_accounts"""
+
+    return {name: Account(name, transactions) for name, transactions in store.read_store(path, start, end).items()}
+
+def save_accounts(path, accounts):
+    """Save a dict of Accounts to a store. See store.write_store for the
+    supported formats."""
+
+    store.write_store(path, {accounts[x].name: accounts[x].transactions for x in accounts})
+
+def merge_transactions(old_transactions, new_transactions):
+    """Merge two overlapping, nonempty chronological lists of transactions into
+    a new list in a single pass, returning it along with how many transactions
+    from new_transactions were added.
+
+    Where the lists overlap they must agree: any transaction in one that isn't
+    in the other must fall on an earlier date than the next transaction in the
+    other, otherwise InconsistentTransactionsError is raised."""
+
+    old_transactions_length = len(old_transactions)
+    new_transactions_length = len(new_transactions)
+    new_transactions_start = new_transactions[0].date
+    old_transactions_start = old_transactions[0].date
+
+    merged_transactions = []
+    old_i = new_i = 0
+
+    # checked once, so the loop below doesn't pay for debug logging when it's disabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+
+    # copy over early non-overlapping transactions
+    if old_transactions_start < new_transactions_start:
+        while old_transactions[old_i].date < new_transactions_start:
+            merged_transactions.append(old_transactions[old_i])
+            old_i += 1
+        logger.debug("Skipped over %s earlier old transactions", old_i)
+    elif new_transactions_start < old_transactions_start:
+        while new_transactions[new_i].date < old_transactions_start:
+            merged_transactions.append(new_transactions[new_i])
+            new_i += 1
+        logger.debug("Added %s earlier new transactions", new_i)
+
+    # compare overlapping transactions
+    # loop ends when we run out of old or new transactions to compare
+    while new_i < new_transactions_length and old_i < old_transactions_length:
+        old_transaction = old_transactions[old_i]
+        new_transaction = new_transactions[new_i]
+        if new_transaction.is_equivalent_to(old_transaction):
+            # transactions match, keep the existing one
+            merged_transactions.append(old_transaction)
+            old_i += 1
+            new_i += 1
+            if debug:
                 logger.debug("Skipping duplicate transaction")
-                continue
-            elif new_transactions[new_i].date < self.transactions[old_i].date:
-                # this new transaction fills in a gap
-                unique_transaction_indexes.insert(0, (old_i, new_i))
-                new_i += 1
-                logger.debug("Marked an overlapping new transaction for insertion")
-            else:
-                # transactions on the same date should agree
-                raise InconsistentTransactionsError(f"New transaction {new_transactions[new_i]} conflicts with {self.transactions[old_i]}")
-
-        # if there are any leftover new transactions, they come after any existing ones
-        for x in range(new_i, new_transactions_length):
-            unique_transaction_indexes.insert(0, (old_transactions_length, x))
-            logger.debug("Marked a later new transaction for insertion")
-
-        # append new transactions and exit
-        # apply in reverse order so higher indexes aren't corrupted by inserting before
-        for x in unique_transaction_indexes:
-            self.transactions.insert(x[0], new_transactions[x[1]])
-        logger.debug(f"Merged {len(unique_transaction_indexes)}/{new_transactions_length} transactions into account {self.name}")
-        return len(unique_transaction_indexes)
+        elif new_transaction.date < old_transaction.date:
+            # this new transaction fills in a gap
+            merged_transactions.append(new_transaction)
+            new_i += 1
+            if debug:
+                logger.debug("Added an overlapping new transaction")
+        else:
+            # transactions on the same date should agree
+            raise InconsistentTransactionsError(f"New transaction {new_transaction} conflicts with {old_transaction}")
+
+    # at most one of these has leftover transactions, which come after everything else
+    merged_transactions.extend(old_transactions[old_i:])
+    merged_transactions.extend(new_transactions[new_i:])
+
+    return (merged_transactions, len(merged_transactions) - old_transactions_length)
+
+def _join_windows(transactions, windows):
+    """Sort a list of (first_date, last_index) windows into transactions,
+    joining any which overlap so the rest are disjoint"""
+
+    joined = []
+    for first_date, last_index in sorted(windows):
+        if joined and first_date <= transactions[joined[-1][1]].date:
+            joined[-1] = (joined[-1][0], max(joined[-1][1], last_index))
+        else:
+            joined.append((first_date, last_index))
+    return joined
+
+def _in_windows(windows, date, i):
+    """Return whether a transaction on date, placed just before transaction i,
+    falls in one of a sorted list of disjoint (first_date, last_index)
+    windows"""
+
+    j = bisect.bisect_right(windows, date, key=operator.itemgetter(0))
+    return j > 0 and i <= windows[j - 1][1]
+
+def _merge_pair(old_transactions, old_windows, new_transactions, new_windows):
+    """Merge two nonempty chronological lists of transactions, which needn't
+    overlap, keeping the old copy of any duplicates. Returns the merged list
+    along with its windows.
+
+    Windows are the sorted (first_date, last_index) spans of the statements
+    which were merged into each list, running from the start of the first
+    date to the last transaction. As when adding those statements in turn
+    with add_unique_transactions, an old transaction may only be missing from
+    new_transactions outside new_windows."""
+
+    STATS.count("pairwise_merges")
+
+    if old_transactions[-1].date < new_transactions[0].date:
+        merged_transactions = list(old_transactions)
+        merged_transactions.extend(new_transactions)
+        offset = len(old_transactions)
+        return (merged_transactions, old_windows + [(first_date, last_index + offset) for first_date, last_index in new_windows])
+
+    if new_transactions[-1].date < old_transactions[0].date:
+        merged_transactions = list(new_transactions)
+        merged_transactions.extend(old_transactions)
+        offset = len(new_transactions)
+        return (merged_transactions, new_windows + [(first_date, last_index + offset) for first_date, last_index in old_windows])
+
+    # copy whatever starts before the other list in one go
+    date = operator.attrgetter("date")
+    old_i = old_start = bisect.bisect_left(old_transactions, new_transactions[0].date, key=date)
+    new_i = new_start = bisect.bisect_left(new_transactions, old_transactions[0].date, key=date)
+    merged_transactions = list(old_transactions[:old_i])
+    merged_transactions.extend(new_transactions[:new_i])
+
+    # where each list had transactions from the other put in between its own,
+    # so the windows can be moved to their place in the merged list
+    new_filled = []
+    old_filled = []
+
+    # then merge like merge_transactions, except that old transactions may
+    # fill gaps in new_transactions between the statements it was merged from
+    while old_i < len(old_transactions) and new_i < len(new_transactions):
+        old_transaction = old_transactions[old_i]
+        new_transaction = new_transactions[new_i]
+        if new_transaction.is_equivalent_to(old_transaction):
+            merged_transactions.append(old_transaction)
+            old_i += 1
+            new_i += 1
+        elif new_transaction.date < old_transaction.date:
+            merged_transactions.append(new_transaction)
+            new_filled.append(old_i)
+            new_i += 1
+        elif old_transaction.date < new_transaction.date and not _in_windows(new_windows, old_transaction.date, new_i):
+            merged_transactions.append(old_transaction)
+            old_filled.append(new_i)
+            old_i += 1
+        else:
+            raise InconsistentTransactionsError(f"New transaction {new_transaction} conflicts with {old_transaction}")
+
+    merged_transactions.extend(old_transactions[old_i:])
+    merged_transactions.extend(new_transactions[new_i:])
+
+    # whatever's left over of either list comes after everything of the other
+    windows = [(first_date, last_index + new_start + bisect.bisect_right(new_filled, last_index)) for first_date, last_index in old_windows]
+    windows.extend((first_date, last_index + old_start + bisect.bisect_right(old_filled, last_index)) for first_date, last_index in new_windows)
+    return (merged_transactions, _join_windows(merged_transactions, windows))
+
+def merge_many(statements):
+    """Merge many chronological lists of transactions into one, with the same
+    result and conflict detection as adding each in turn to an Account with
+    add_unique_transactions, as long as each list is continuous like a parsed
+    statement.
+
+    Lists with gaps in them are still checked against each other, but a list
+    missing a transaction which an earlier one had isn't a conflict if a
+    later list has it too, whereas adding them in turn would raise.
+
+    Statements are sorted by date window to split them into runs which
+    overlap each other. The runs are simply concatenated, while the
+    statements within each run are merged pairwise in a balanced tree, taking
+    O(N log k) time for N transactions in k statements rather than O(N k)."""
+
+    statements = [s for s in statements if len(s) > 0]
+    if len(statements) == 0:
+        return []
+    if len(statements) == 1:
+        return statements[0]
+
+    # group statement indexes into runs of overlapping date windows
+    order = sorted(range(len(statements)), key=lambda i: (statements[i][0].date, statements[i][-1].date))
+    runs = []
+    run_end = None
+    for i in order:
+        if runs and statements[i][0].date <= run_end:
+            runs[-1].append(i)
+            run_end = max(run_end, statements[i][-1].date)
+        else:
+            runs.append([i])
+            run_end = statements[i][-1].date
+
+    merged_transactions = []
+    for run in runs:
+        # merging in the order given keeps the same copy of each duplicate
+        # transaction as adding the statements one by one would
+        # each level holds (transactions, windows of the statements merged into them)
+        level = [(statements[i], [(statements[i][0].date, len(statements[i]) - 1)]) for i in sorted(run)]
+        while len(level) > 1:
+            next_level = []
+            for j in range(0, len(level) - 1, 2):
+                next_level.append(_merge_pair(*level[j], *level[j + 1]))
+            if len(level) % 2 == 1:
+                next_level.append(level[-1])
+            level = next_level
+        merged_transactions.extend(level[0][0])
+
+    logger.debug("Merged %s statements in %s runs", len(statements), len(runs))
+    return merged_transactions
+
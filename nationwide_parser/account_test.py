@@ -1,8 +1,10 @@
 from datetime import date
+import random
 import unittest
 
-from nationwide_parser.transaction import Transaction
-from nationwide_parser.account import Account, InconsistentTransactionsError
+from nationwide_parser.transaction import Transaction, TransactionTable
+from nationwide_parser.account import Account, InconsistentTransactionsError, merge_many
+from nationwide_parser.synthetic import day_start, generate_transactions
 
 
 class TestTransactionMerging(unittest.TestCase):
@@ -26,6 +28,21 @@ class TestTransactionMerging(unittest.TestCase):
                 Transaction(date(2025, 2, 4), -100, "abc", "xyz", 400),
             ])
 
+    def test_merge_into_gap(self):
+        new_transactions = [
+            Transaction(date(2025, 2, 3), -300, "abc", "xyz", 800),
+            ]
+        num_added = self.test_account.add_unique_transactions(new_transactions)
+
+        self.assertEqual(num_added, 1)
+        self.assertEqual(self.test_account.transactions, [
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+                Transaction(date(2025, 2, 3), -300, "abc", "xyz", 800),
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 500),
+                Transaction(date(2025, 2, 4), -100, "abc", "xyz", 400),
+            ])
+
     def test_self_merge(self):
         num_added = self.test_account.add_unique_transactions(self.test_account.transactions)
 
@@ -165,7 +182,8 @@ class TestTransactionMerging(unittest.TestCase):
                 Transaction(date(2025, 1, 1), 100, "abc", "xyz", 100),
                 ]
 
-        self.test_account.add_unique_transactions(new_transactions)
+        num_added = self.test_account.add_unique_transactions(new_transactions)
+        self.assertEqual(num_added, 1)
         self.assertEqual(self.test_account.transactions, [
                 Transaction(date(2025, 1, 1), 100, "abc", "xyz", 100),
                 Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
@@ -179,7 +197,8 @@ class TestTransactionMerging(unittest.TestCase):
                 Transaction(date(2025, 3, 1), 100, "abc", "xyz", 500),
                 ]
 
-        self.test_account.add_unique_transactions(new_transactions)
+        num_added = self.test_account.add_unique_transactions(new_transactions)
+        self.assertEqual(num_added, 1)
         self.assertEqual(self.test_account.transactions, [
                 Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
                 Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
@@ -188,6 +207,85 @@ class TestTransactionMerging(unittest.TestCase):
                 Transaction(date(2025, 3, 1), 100, "abc", "xyz", 500),
             ])
 
+class TestMergeMany(unittest.TestCase):
+    def setUp(self):
+        self.transactions = generate_transactions(1000)
+        day_starts = [i for i in range(len(self.transactions)) if day_start(self.transactions, i) == i]
+
+        # lots of overlapping statements, plus one separate from the rest
+        rng = random.Random(0)
+        self.statements = []
+        for _ in range(20):
+            start, end = sorted(rng.sample(day_starts[:len(day_starts) // 2], 2))
+            self.statements.append(self.transactions[start:end])
+        self.statements.append(self.transactions[day_starts[-10]:])
+
+    def fold(self, statements):
+        account = Account("aaa", [])
+        for statement in statements:
+            account.add_unique_transactions(list(statement))
+        return account.transactions
+
+    def test_matches_adding_one_by_one(self):
+        self.assertEqual(merge_many(self.statements), self.fold(self.statements))
+        self.assertEqual(merge_many(self.statements[::-1]), self.fold(self.statements[::-1]))
+        self.assertEqual(merge_many([]), [])
+        self.assertEqual(merge_many([[], self.statements[0]]), self.statements[0])
+
+    def test_keeps_first_copy_of_duplicates(self):
+        relabelled = [t.redate(t.date) for t in self.statements[1]]
+        for t in relabelled:
+            t.description = "relabelled"
+
+        statements = [self.statements[0], relabelled] + self.statements[2:]
+        merged = merge_many(statements)
+        self.assertEqual(merged, self.fold(statements))
+        self.assertEqual([t.description for t in merged], [t.description for t in self.fold(statements)])
+
+    def test_conflict(self):
+        conflicting = list(self.statements[5])
+        conflicting[len(conflicting) // 2] = conflicting[len(conflicting) // 2].redate(date(2000, 1, 1))
+        with self.assertRaises(InconsistentTransactionsError):
+            merge_many(self.statements[:5] + [conflicting] + self.statements[6:])
+
+    def test_conflict_with_gap(self):
+        a = [
+                Transaction(date(2025, 1, 1), 100, "abc", "xyz", 100),
+                Transaction(date(2025, 1, 2), 50, "abc", "xyz", 150),
+                Transaction(date(2025, 1, 3), 10, "abc", "xyz", 160),
+            ]
+        b = [a[0], a[2]]
+
+        with self.assertRaises(InconsistentTransactionsError):
+            Account("aaa", list(a)).add_unique_transactions(b)
+        with self.assertRaises(InconsistentTransactionsError):
+            merge_many([a, b])
+
+        # b's gap can still be filled by a statement merged after it
+        self.assertEqual(merge_many([b, a]), self.fold([b, a]))
+
+    def test_statements_ending_mid_day(self):
+        # statements start with a complete day, but can end partway through one
+        rng = random.Random(1)
+        for _ in range(50):
+            statements = []
+            for _ in range(6):
+                start, end = sorted(rng.sample(range(len(self.transactions) // 20), 2))
+                statements.append(self.transactions[day_start(self.transactions, start):end])
+            self.assertEqual(merge_many(statements), self.fold(statements))
+
+        transactions = generate_transactions(40, seed=11)
+        statements = [transactions[14:18], transactions[14:19], transactions[18:19], transactions[4:17]]
+        self.assertEqual(merge_many(statements), self.fold(statements))
+
+    def test_from_statements(self):
+        account = Account.from_statements("aaa", self.statements)
+        self.assertEqual(account.transactions, self.fold(self.statements))
+
+        account = Account.from_statements("aaa", [TransactionTable(s) for s in self.statements])
+        self.assertIsInstance(account.transactions, TransactionTable)
+        self.assertEqual(account.transactions, self.fold(self.statements))
+
 class TestAccountConsistency(unittest.TestCase):
     def test_consistent_account(self):
         account = Account("aaa", [
@@ -230,3 +328,122 @@ class TestAccountConsistency(unittest.TestCase):
 
         with self.assertRaises(InconsistentTransactionsError):
             account.all_transactions_are_continuous()
+
+    def test_gaps(self):
+        transactions = [
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 10000), # gap
+                Transaction(date(2025, 2, 4), -100, "abc", "xyz", 9900),
+                Transaction(date(2025, 2, 6), -100, "abc", "xyz", 500), # gap
+            ]
+
+        for account in [Account("aaa", transactions), Account("aaa", TransactionTable(transactions))]:
+            self.assertEqual(account.gaps(), [2, 4])
+            self.assertEqual(account.complete_ranges(), [
+                    (date(2025, 2, 1), date(2025, 2, 2)),
+                    (date(2025, 2, 4), date(2025, 2, 4)),
+                    (date(2025, 2, 6), date(2025, 2, 6)),
+                ])
+
+        self.assertEqual(Account("aaa", transactions[:2]).complete_ranges(), [(date(2025, 2, 1), date(2025, 2, 2))])
+        self.assertEqual(Account("aaa", []).complete_ranges(), [])
+
+    def test_inconsistency_after_gap(self):
+        account = Account("aaa", [
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 10000), # gap
+                Transaction(date(2025, 2, 4), -100, "abc", "xyz", 0), # does not add up on same day
+            ])
+
+        self.assertFalse(account.all_transactions_are_continuous())
+        with self.assertRaises(InconsistentTransactionsError):
+            account.gaps()
+
+class TestAccountLookups(unittest.TestCase):
+    def setUp(self):
+        transactions = [
+            Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+            Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+            Transaction(date(2025, 2, 4), -600, "abc", "xyz", 500),
+            Transaction(date(2025, 2, 4), -100, "abc", "xyz", 400),
+            ]
+        self.accounts = [Account("aaa", transactions), Account("aaa", TransactionTable(transactions))]
+
+    def test_balance_on(self):
+        for account in self.accounts:
+            self.assertIsNone(account.balance_on(date(2025, 1, 31)))
+            self.assertEqual(account.balance_on(date(2025, 2, 1)), 1001)
+            self.assertEqual(account.balance_on(date(2025, 2, 3)), 1100)
+            self.assertEqual(account.balance_on(date(2025, 2, 4)), 400)
+            self.assertEqual(account.balance_on(date(2026, 1, 1)), 400)
+
+    def test_transactions_between(self):
+        for account in self.accounts:
+            self.assertEqual(account.transactions_between(date(2025, 2, 2), date(2025, 2, 4)), account.transactions[1:])
+            self.assertEqual(account.transactions_between(date(2025, 2, 3), date(2025, 2, 3)), [])
+            self.assertEqual(account.transactions_between(date(2025, 1, 1), date(2025, 2, 1)), account.transactions[:1])
+
+    def test_contains(self):
+        for account in self.accounts:
+            self.assertTrue(account.contains(Transaction(date(2025, 2, 4), -600, "other", "other", 500)))
+            self.assertFalse(account.contains(Transaction(date(2025, 2, 3), -600, "abc", "xyz", 500)))
+
+            new_transaction = Transaction(date(2025, 2, 5), -100, "abc", "xyz", 300)
+            self.assertFalse(account.contains(new_transaction))
+            account.add_unique_transactions([new_transaction])
+            self.assertTrue(account.contains(new_transaction))
+
+    def test_covers(self):
+        for account in self.accounts:
+            self.assertTrue(account.covers(account.transactions[1:]))
+            self.assertTrue(account.covers([account.transactions[2]]))
+            self.assertTrue(account.covers([]))
+            self.assertFalse(account.covers([Transaction(date(2025, 2, 5), -100, "abc", "xyz", 300)]))
+            self.assertFalse(account.covers(list(account.transactions) + [Transaction(date(2025, 2, 5), -100, "abc", "xyz", 300)]))
+
+        # both ends are present, but not what's between them
+        gapped = Account("aaa", [
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 500), # gap
+                ])
+        self.assertFalse(gapped.covers(gapped.transactions))
+
+class TestTransactionTableAccount(unittest.TestCase):
+    def setUp(self):
+        self.test_account = Account("****11111", TransactionTable([
+            Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+            Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+            Transaction(date(2025, 2, 4), -600, "abc", "xyz", 500),
+            Transaction(date(2025, 2, 4), -100, "abc", "xyz", 400),
+            ]))
+
+    def test_valid_combined_merge(self):
+        new_transactions = [
+                Transaction(date(2025, 1, 1), 100, "abc", "xyz", 100), # new
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+                Transaction(date(2025, 2, 3), 100, "abc", "xyz", 1200), # new
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 500),
+                Transaction(date(2025, 2, 4), -100, "abc", "xyz", 400),
+                Transaction(date(2025, 2, 5), -200, "abc", "xyz", 200), # new
+                ]
+        num_added = self.test_account.add_unique_transactions(new_transactions)
+
+        self.assertEqual(num_added, 3)
+        self.assertEqual(self.test_account.transactions, [
+                Transaction(date(2025, 1, 1), 100, "abc", "xyz", 100), # new
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+                Transaction(date(2025, 2, 3), 100, "abc", "xyz", 1200), # new
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 500),
+                Transaction(date(2025, 2, 4), -100, "abc", "xyz", 400),
+                Transaction(date(2025, 2, 5), -200, "abc", "xyz", 200), # new
+            ])
+
+    def test_continuity(self):
+        self.assertTrue(self.test_account.all_transactions_are_continuous())
+
+        self.test_account.transactions.append(Transaction(date(2025, 2, 3), -100, "abc", "xyz", 300))
+        with self.assertRaises(InconsistentTransactionsError):
+            self.test_account.all_transactions_are_continuous()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import tempfile
+
+from nationwide_parser import continuity, statement, transaction, utils
+from nationwide_parser.utils import hash_file
+
+
+logger = logging.getLogger(__name__)
+
+# bump when the format of cache entries changes
+CACHE_VERSION = 1
+
+# names of the directories entries are kept in, by version and parser fingerprint
+_CACHE_DIR_PATTERN = re.compile(r"v\d+-[0-9a-f]{16}")
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "nationwide-parser")
+
+def _parser_fingerprint():
+    """Hash the source of the modules that determine what a statement parses
+    to, so that changing the parser invalidates existing cache entries."""
+
+    digest = hashlib.sha256()
+    for module in (continuity, statement, transaction, utils):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def _atomic_write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class StatementCache:
+    """An on-disk cache of parsed statements, i.e. the (account_name,
+    transactions) results of read_nationwide_file.
+
+    Entries are stored by a hash of the statement's contents. To avoid hashing
+    every file on every run, an index remembers the hash of each file path
+    along with its size and modification time, and the hash is only
+    recomputed when these change.
+
+    Entries are kept in a directory per cache version and parser fingerprint,
+    and the least recently used entries are evicted when the cache grows past
+    max_size bytes."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=256 * 1024 * 1024):
+        self.root_dir = cache_dir
+        self.cache_dir = os.path.join(cache_dir, f"v{CACHE_VERSION}-{_parser_fingerprint()}")
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._index_path = os.path.join(self.cache_dir, "index.json")
+        try:
+            with open(self._index_path) as f:
+                self._index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._index = {}
+        self._index_changed = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.pickle")
+
+    def _digest(self, file):
+        path = os.path.abspath(file)
+        stat_result = os.stat(path)
+        key = [stat_result.st_size, stat_result.st_mtime_ns]
+
+        entry = self._index.get(path)
+        if entry is not None and entry[:2] == key:
+            return entry[2]
+
+        digest = hash_file(path)
+        self._index[path] = key + [digest]
+        self._index_changed = True
+        return digest
+
+    def get(self, file):
+        """Return the cached result for a statement, or None if it isn't
+        cached. A statement which can't be read isn't cached, leaving the
+        error for whatever reads it."""
+
+        try:
+            entry_path = self._entry_path(self._digest(file))
+        except OSError:
+            self.misses += 1
+            return None
+
+        try:
+            with open(entry_path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ValueError) as e:
+            logger.warning(f"Ignoring corrupt cache entry {entry_path}: {e}")
+            self.misses += 1
+            return None
+
+        # mark as recently used for eviction
+        os.utime(entry_path)
+        self.hits += 1
+        logger.debug(f'Using cached result for "{os.path.basename(file)}"')
+        return result
+
+    def put(self, file, result):
+        try:
+            entry_path = self._entry_path(self._digest(file))
+        except OSError as e:
+            # e.g. the statement was removed once it had been read
+            logger.debug(f'Not caching "{os.path.basename(file)}": {e}')
+            return
+        _atomic_write(entry_path, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in
+        max_size, returning how many were deleted"""
+
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".pickle"):
+                    stat_result = entry.stat()
+                    entries.append((stat_result.st_mtime_ns, stat_result.st_size, entry.path))
+                    total_size += stat_result.st_size
+
+        evicted = 0
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            os.unlink(path)
+            total_size -= size
+            evicted += 1
+
+        if evicted > 0:
+            logger.debug(f"Evicted {evicted} entries from statement cache")
+        return evicted
+
+    def close(self):
+        """Save the index of file hashes and apply the size limit"""
+
+        if self._index_changed:
+            # forget files which no longer exist
+            self._index = {path: entry for path, entry in self._index.items() if os.path.exists(path)}
+            _atomic_write(self._index_path, json.dumps(self._index).encode())
+            self._index_changed = False
+        self.evict()
+
+        # entries for other parser versions can never be used again
+        with os.scandir(self.root_dir) as it:
+            for entry in it:
+                # only ever remove directories the cache made, as the cache directory
+                # may hold anything else
+                if entry.is_dir() and _CACHE_DIR_PATTERN.fullmatch(entry.name) and entry.path != self.cache_dir:
+                    logger.debug(f"Removing stale statement cache {entry.path}")
+                    shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.cache import StatementCache
+from nationwide_parser.ingest import read_statements
+from nationwide_parser.statement import read_nationwide_file
+
+
+TEST_DATA_DIR = "fixtures"
+
+class TestStatementCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.data_dir = tempfile.mkdtemp()
+        self.infile = os.path.join(self.data_dir, "test-statement.csv")
+        shutil.copy(os.path.join(TEST_DATA_DIR, "test-statement.csv"), self.infile)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.data_dir)
+
+    def test_round_trip(self):
+        cache = StatementCache(self.cache_dir)
+        self.assertIsNone(cache.get(self.infile))
+
+        result = read_nationwide_file(self.infile)
+        cache.put(self.infile, result)
+        cache.close()
+
+        cache = StatementCache(self.cache_dir)
+        self.assertEqual(cache.get(self.infile), result)
+        self.assertEqual(cache.hits, 1)
+
+    def test_modified_file_is_not_cached(self):
+        cache = StatementCache(self.cache_dir)
+        cache.put(self.infile, read_nationwide_file(self.infile))
+
+        with open(self.infile, "a", encoding="latin_1") as f:
+            f.write("\n")
+        self.assertIsNone(cache.get(self.infile))
+
+    def test_eviction(self):
+        cache = StatementCache(self.cache_dir, max_size=0)
+        cache.put(self.infile, read_nationwide_file(self.infile))
+        cache.close()
+
+        self.assertIsNone(cache.get(self.infile))
+
+    def test_stale_versions_removed(self):
+        stale_dir = os.path.join(self.cache_dir, "v0-0123456789abcdef")
+        os.makedirs(stale_dir)
+
+        StatementCache(self.cache_dir).close()
+        self.assertFalse(os.path.exists(stale_dir))
+
+    def test_other_directories_kept(self):
+        # the cache directory may be shared with anything, e.g. --cache-dir ~
+        other_dirs = [os.path.join(self.cache_dir, name) for name in ["videos", "venv", "v1-notacache"]]
+        for other_dir in other_dirs:
+            os.makedirs(os.path.join(other_dir, "holiday"))
+            open(os.path.join(other_dir, "holiday", "clip.mp4"), "w").close()
+
+        StatementCache(self.cache_dir).close()
+        for other_dir in other_dirs:
+            self.assertTrue(os.path.exists(os.path.join(other_dir, "holiday", "clip.mp4")), other_dir)
+
+    def test_read_statements_uses_cache(self):
+        infiles = [self.infile, os.path.join(TEST_DATA_DIR, "random-file.txt")]
+        cache = StatementCache(self.cache_dir)
+        uncached = list(read_statements(infiles, cache=cache))
+        cached = list(read_statements(infiles, cache=cache))
+
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(uncached[0], cached[0])
+        self.assertEqual(str(uncached[1][1]), str(cached[1][1]))
+
+    def test_missing_file(self):
+        # a statement can vanish between being found and read
+        missing = os.path.join(self.data_dir, "missing.csv")
+        cache = StatementCache(self.cache_dir)
+        [(file, result)] = read_statements([missing], cache=cache)
+
+        self.assertEqual(file, missing)
+        self.assertIsInstance(result, FileNotFoundError)
+        self.assertEqual(cache.misses, 1)
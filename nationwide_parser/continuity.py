@@ -0,0 +1,38 @@
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _as_ordinals(dates):
+    """Return dates as a NumPy array of ordinals, without copying a
+    TransactionTable's column"""
+
+    if len(dates) > 0 and not isinstance(dates[0], int):
+        return numpy.fromiter((d.toordinal() for d in dates), dtype=numpy.int64, count=len(dates))
+    return numpy.asarray(dates, dtype=numpy.int64)
+
+def _iter_breaks_numpy(dates, amounts, closing_balances):
+    dates = _as_ordinals(dates)
+    amounts = numpy.asarray(amounts, dtype=numpy.int64)
+    closing_balances = numpy.asarray(closing_balances, dtype=numpy.int64)
+
+    follows = (dates[1:] >= dates[:-1]) & (closing_balances[1:] - closing_balances[:-1] == amounts[1:])
+    yield from (int(i) + 1 for i in numpy.flatnonzero(~follows))
+
+def _iter_breaks_python(dates, amounts, closing_balances):
+    for i in range(1, len(dates)):
+        # equivalent to Transaction.succeeds, without building Transactions
+        if dates[i] < dates[i - 1] or closing_balances[i] != closing_balances[i - 1] + amounts[i]:
+            yield i
+
+def iter_breaks(dates, amounts, closing_balances):
+    """Yield each index i where transaction i doesn't follow transaction i - 1,
+    given the parallel columns returned by transaction_columns.
+
+    The whole chain is checked with array operations if NumPy is installed,
+    otherwise it's checked lazily, one pair at a time."""
+
+    if numpy is not None and len(dates) > 1:
+        return _iter_breaks_numpy(dates, amounts, closing_balances)
+    return _iter_breaks_python(dates, amounts, closing_balances)
@@ -0,0 +1,31 @@
+from datetime import date
+import unittest
+from unittest import mock
+
+from nationwide_parser import continuity
+from nationwide_parser.synthetic import generate_transactions
+from nationwide_parser.transaction import TransactionTable, transaction_columns
+
+
+class TestIterBreaks(unittest.TestCase):
+    def setUp(self):
+        transactions = generate_transactions(200)
+        # drop a few transactions to make gaps, and make one inconsistent
+        del transactions[150]
+        del transactions[50:53]
+        transactions[100] = transactions[100].redate(date(2010, 1, 1))
+        self.transactions = transactions
+
+    def check_breaks(self):
+        for transactions in [self.transactions, TransactionTable(self.transactions)]:
+            self.assertEqual(list(continuity.iter_breaks(*transaction_columns(transactions))), [50, 100, 147])
+            self.assertEqual(list(continuity.iter_breaks(*transaction_columns(transactions[:1]))), [])
+            self.assertEqual(list(continuity.iter_breaks(*transaction_columns(transactions[:0]))), [])
+
+    def test_python(self):
+        with mock.patch.object(continuity, "numpy", None):
+            self.check_breaks()
+
+    @unittest.skipIf(continuity.numpy is None, "NumPy is not installed")
+    def test_numpy(self):
+        self.check_breaks()
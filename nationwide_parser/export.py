@@ -0,0 +1,92 @@
+import contextlib
+import csv
+from dataclasses import dataclass
+import json
+import os
+import sys
+import tempfile
+from typing import Callable
+
+from nationwide_parser.ledger import _new_file_mode
+from nationwide_parser.store import dump_store
+from nationwide_parser.utils import decimalise, isoformat
+
+
+@dataclass(slots=True)
+class ExportFormat:
+    """A way of writing merged accounts out other than as a ledger, which is
+    only written by write_ledger. write(f, accounts) streams a dict of
+    Accounts to f, a file opened in binary mode if binary is set or as text
+    otherwise."""
+
+    name: str
+    extension: str
+    binary: bool
+    write: Callable
+
+# formats accounts can be exported in, by name
+EXPORT_FORMATS = {}
+
+def register_export_format(export_format):
+    """Add an ExportFormat to EXPORT_FORMATS, returning it"""
+
+    EXPORT_FORMATS[export_format.name] = export_format
+    return export_format
+
+CSV_HEADER = ["account", "date", "type", "description", "amount", "balance"]
+
+def _write_csv(f, accounts):
+    """One row per transaction, with ISO dates and amounts in pounds"""
+
+    writer = csv.writer(f, lineterminator="\n")
+    writer.writerow(CSV_HEADER)
+    for x in accounts:
+        writer.writerows((x, isoformat(t.date), t.kind, t.description, decimalise(t.amount), decimalise(t.closing_balance)) for t in accounts[x].transactions)
+
+def _write_json_lines(f, accounts):
+    """One JSON object per transaction, with amounts in pennies"""
+
+    # only the strings need escaping, so each line is formatted directly
+    # rather than building a dict for json.dumps
+    encode = json.encoder.encode_basestring
+    for x in accounts:
+        account = encode(x)
+        f.writelines(f'{{"account": {account}, "date": "{isoformat(t.date)}", "type": {encode(t.kind)}, "description": {encode(t.description)}, "amount": {t.amount}, "balance": {t.closing_balance}}}\n' for t in accounts[x].transactions)
+
+def _write_columnar(f, accounts):
+    dump_store(f, {x: accounts[x].transactions for x in accounts})
+
+register_export_format(ExportFormat("csv", "csv", False, _write_csv))
+register_export_format(ExportFormat("jsonl", "jsonl", False, _write_json_lines))
+# the binary store format, which read_store loads
+register_export_format(ExportFormat("columnar", "nwas", True, _write_columnar))
+
+@contextlib.contextmanager
+def _open_output(path, binary):
+    """Open path for writing, or stdout if it's "-". Files are written to a
+    temporary file which replaces path once complete."""
+
+    if path == "-":
+        yield sys.stdout.buffer if binary else sys.stdout
+        sys.stdout.flush()
+        return
+
+    output_dir = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if binary else "w", newline=None if binary else "") as f:
+            yield f
+        os.chmod(tmp_path, _new_file_mode(path))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def export_accounts(path, accounts, format_name):
+    """Write a dict of Accounts to path, or stdout if it's "-", in the
+    format in EXPORT_FORMATS called format_name"""
+
+    export_format = EXPORT_FORMATS[format_name]
+    with _open_output(path, export_format.binary) as f:
+        export_format.write(f, accounts)
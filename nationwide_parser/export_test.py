@@ -0,0 +1,73 @@
+import csv
+from datetime import date
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.account import Account
+from nationwide_parser.export import CSV_HEADER, EXPORT_FORMATS, export_accounts
+from nationwide_parser.store import read_store
+from nationwide_parser.transaction import Transaction
+
+
+def _accounts():
+    return {
+        "****11111": Account("****11111", [
+            Transaction(date(2025, 2, 1), 1, "abc", 'x, "y" and z', 1001),
+            Transaction(date(2025, 2, 2), -12345, "abc", "café", -11344),
+            ]),
+        "****22222": Account("****22222", [
+            Transaction(date(2025, 3, 1), -50, "def", "xyz", 50),
+            ]),
+        }
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.accounts = _accounts()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def export(self, format_name):
+        path = os.path.join(self.output_dir, f"out.{EXPORT_FORMATS[format_name].extension}")
+        export_accounts(path, self.accounts, format_name)
+        return path
+
+    def test_csv(self):
+        with open(self.export("csv"), newline="") as f:
+            rows = list(csv.reader(f))
+
+        self.assertEqual(rows[0], CSV_HEADER)
+        self.assertEqual(rows[1:], [
+            ["****11111", "2025-02-01", "abc", 'x, "y" and z', "0.01", "10.01"],
+            ["****11111", "2025-02-02", "abc", "café", "-123.45", "-113.44"],
+            ["****22222", "2025-03-01", "def", "xyz", "-0.50", "0.50"],
+            ])
+
+    def test_json_lines(self):
+        with open(self.export("jsonl")) as f:
+            rows = [json.loads(line) for line in f]
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0], {"account": "****11111", "date": "2025-02-01", "type": "abc", "description": 'x, "y" and z', "amount": 1, "balance": 1001})
+        self.assertEqual(rows[1]["description"], "café")
+        self.assertEqual(rows[2]["account"], "****22222")
+
+    def test_columnar(self):
+        loaded = read_store(self.export("columnar"))
+        self.assertEqual({x: list(transactions) for x, transactions in loaded.items()}, {x: self.accounts[x].transactions for x in self.accounts})
+
+    def test_failed_export_keeps_output(self):
+        path = self.export("csv")
+        with open(path) as f:
+            exported = f.read()
+
+        self.accounts["****33333"] = Account("****33333", [None])
+        with self.assertRaises(AttributeError):
+            export_accounts(path, self.accounts, "csv")
+        with open(path) as f:
+            self.assertEqual(f.read(), exported)
+        self.assertEqual(os.listdir(self.output_dir), ["out.csv"])
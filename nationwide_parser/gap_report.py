@@ -0,0 +1,116 @@
+from dataclasses import dataclass, field
+import datetime
+import json
+
+from nationwide_parser.utils import decimalise
+
+
+@dataclass(slots=True)
+class Segment:
+    """A run of transactions with nothing missing, and the input files which
+    had transactions in it"""
+
+    first_date: datetime.date
+    last_date: datetime.date
+    num_transactions: int
+    files: list = field(default_factory=list)
+
+@dataclass(slots=True)
+class Gap:
+    """Missing transactions between the end of one segment and the start of
+    the next"""
+
+    last_date: datetime.date
+    next_date: datetime.date
+    expected_opening_balance: int
+    observed_opening_balance: int
+
+    def missing_amount(self):
+        return self.observed_opening_balance - self.expected_opening_balance
+
+@dataclass(slots=True)
+class GapReport:
+    account_name: str
+    segments: list
+    gaps: list
+
+    def is_complete(self):
+        return len(self.gaps) == 0
+
+def _assign_files(segments, windows):
+    """Add each file to every segment its (first_date, last_date, file) window
+    overlaps, sweeping both in date order"""
+
+    windows = sorted(windows, key=lambda w: w[0])
+    next_window = 0
+    active = []
+    for segment in segments:
+        while next_window < len(windows) and windows[next_window][0] <= segment.last_date:
+            active.append(windows[next_window])
+            next_window += 1
+        # windows which ended before this segment can't overlap any later ones
+        active = [w for w in active if w[1] >= segment.first_date]
+        segment.files = [w[2] for w in active]
+
+def gap_report(account, windows=()):
+    """Build a GapReport for an Account in a single pass over its transactions.
+
+    windows is an iterable of (first_date, last_date, file) for the input
+    files the account's transactions were read from. Raises
+    InconsistentTransactionsError as Account.gaps does."""
+
+    transactions = account.transactions
+    if len(transactions) == 0:
+        return GapReport(account.name, [], [])
+
+    segments = []
+    gaps = []
+    start = 0
+    for i in account.gaps() + [len(transactions)]:
+        segments.append(Segment(transactions[start].date, transactions[i - 1].date, i - start))
+        if i < len(transactions):
+            last_txn = transactions[i - 1]
+            next_txn = transactions[i]
+            gaps.append(Gap(last_txn.date, next_txn.date, last_txn.closing_balance, next_txn.closing_balance - next_txn.amount))
+        start = i
+
+    _assign_files(segments, windows)
+    return GapReport(account.name, segments, gaps)
+
+def format_gap_table(reports):
+    """Render GapReports as a plain text table of each account's segments and
+    the gaps between them"""
+
+    lines = []
+    for report in reports:
+        if report.is_complete():
+            lines.append(f"{report.account_name}: complete")
+        else:
+            lines.append(f"{report.account_name}: {len(report.gaps)} {'gap' if len(report.gaps) == 1 else 'gaps'}")
+        lines.append(f"  {'from':<10}  {'to':<10}  {'expected':>12}  {'observed':>12}  {'missing':>12}  files")
+        for i, segment in enumerate(report.segments):
+            lines.append(f"  {segment.first_date.isoformat():<10}  {segment.last_date.isoformat():<10}  {'':>12}  {'':>12}  {'':>12}  {', '.join(segment.files)}")
+            if i < len(report.gaps):
+                gap = report.gaps[i]
+                lines.append(f"  {gap.last_date.isoformat():<10}  {gap.next_date.isoformat():<10}  {decimalise(gap.expected_opening_balance):>12}  {decimalise(gap.observed_opening_balance):>12}  {decimalise(gap.missing_amount()):>12}  (gap)")
+    return "\n".join(lines) + "\n"
+
+def gap_report_json(reports):
+    """Render GapReports as JSON, with balances in pennies"""
+
+    return json.dumps([{
+            "account": report.account_name,
+            "segments": [{
+                    "first_date": segment.first_date.isoformat(),
+                    "last_date": segment.last_date.isoformat(),
+                    "transactions": segment.num_transactions,
+                    "files": segment.files,
+                    } for segment in report.segments],
+            "gaps": [{
+                    "last_date": gap.last_date.isoformat(),
+                    "next_date": gap.next_date.isoformat(),
+                    "expected_opening_balance": gap.expected_opening_balance,
+                    "observed_opening_balance": gap.observed_opening_balance,
+                    "missing_amount": gap.missing_amount(),
+                    } for gap in report.gaps],
+            } for report in reports], indent=1) + "\n"
@@ -0,0 +1,65 @@
+from datetime import date
+import json
+import unittest
+
+from nationwide_parser.account import Account, InconsistentTransactionsError
+from nationwide_parser.gap_report import Gap, Segment, format_gap_table, gap_report, gap_report_json
+from nationwide_parser.transaction import Transaction, TransactionTable
+
+
+class TestGapReport(unittest.TestCase):
+    def setUp(self):
+        self.transactions = [
+                Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+                Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+                Transaction(date(2025, 2, 4), -600, "abc", "xyz", 10000), # 9500 missing
+                Transaction(date(2025, 2, 4), -100, "abc", "xyz", 9900),
+                Transaction(date(2025, 2, 6), -100, "abc", "xyz", 500), # 9300 missing
+            ]
+        self.windows = [
+                (date(2025, 2, 4), date(2025, 2, 6), "b.csv"),
+                (date(2025, 2, 1), date(2025, 2, 2), "a.csv"),
+                (date(2025, 2, 1), date(2025, 2, 4), "c.csv"),
+            ]
+
+    def test_gap_report(self):
+        for transactions in [self.transactions, TransactionTable(self.transactions)]:
+            report = gap_report(Account("aaa", transactions), self.windows)
+
+            self.assertFalse(report.is_complete())
+            self.assertEqual(report.segments, [
+                    Segment(date(2025, 2, 1), date(2025, 2, 2), 2, ["a.csv", "c.csv"]),
+                    Segment(date(2025, 2, 4), date(2025, 2, 4), 2, ["c.csv", "b.csv"]),
+                    Segment(date(2025, 2, 6), date(2025, 2, 6), 1, ["b.csv"]),
+                ])
+            self.assertEqual(report.gaps, [
+                    Gap(date(2025, 2, 2), date(2025, 2, 4), 1100, 10600),
+                    Gap(date(2025, 2, 4), date(2025, 2, 6), 9900, 600),
+                ])
+            self.assertEqual([gap.missing_amount() for gap in report.gaps], [9500, -9300])
+
+    def test_complete_account(self):
+        report = gap_report(Account("aaa", self.transactions[:2]))
+        self.assertTrue(report.is_complete())
+        self.assertEqual(report.segments, [Segment(date(2025, 2, 1), date(2025, 2, 2), 2, [])])
+
+        self.assertEqual(gap_report(Account("aaa", [])).segments, [])
+
+    def test_inconsistent_account(self):
+        self.transactions[3].closing_balance = 0
+        with self.assertRaises(InconsistentTransactionsError):
+            gap_report(Account("aaa", self.transactions))
+
+    def test_formats(self):
+        reports = [gap_report(Account("aaa", self.transactions), self.windows), gap_report(Account("bbb", self.transactions[:2]))]
+
+        table = format_gap_table(reports)
+        self.assertIn("aaa: 2 gaps", table)
+        self.assertIn("  2025-02-02  2025-02-04         11.00        106.00         95.00  (gap)", table)
+        self.assertIn("bbb: complete", table)
+
+        data = json.loads(gap_report_json(reports))
+        self.assertEqual([r["account"] for r in data], ["aaa", "bbb"])
+        self.assertEqual(data[0]["gaps"][1]["missing_amount"], -9300)
+        self.assertEqual(data[0]["segments"][2]["files"], ["b.csv"])
+        self.assertEqual(data[1]["gaps"], [])
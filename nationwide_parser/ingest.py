@@ -0,0 +1,245 @@
+import collections
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import fnmatch
+import itertools
+import logging
+import os
+import time
+
+from nationwide_parser.statement import SNIFF_SIZE, StatementParseError, UnrecognisedFileError, read_nationwide_bytes, read_nationwide_file, sniff_statement
+from nationwide_parser.stats import STATS, collect_stats
+from nationwide_parser.utils import hash_file
+
+
+logger = logging.getLogger(__name__)
+
+def _matches(name, include, exclude):
+    if include and not any(fnmatch.fnmatch(name, pattern) for pattern in include):
+        return False
+    return not any(fnmatch.fnmatch(name, pattern) for pattern in exclude)
+
+def _scan_directory(directory, recursive, include, exclude):
+    """Yield a DirEntry for each matching file in directory"""
+
+    # scandir gets file types from the directory listing, so most entries
+    # never need a separate stat call
+    with os.scandir(directory) as it:
+        entries = list(it)
+
+    for entry in entries:
+        if entry.is_dir():
+            # don't follow symlinks when recursing, as they could form a loop
+            if recursive and not entry.is_symlink():
+                yield from _scan_directory(entry.path, recursive, include, exclude)
+        elif _matches(entry.name, include, exclude):
+            yield entry
+
+def find_statements(paths, recursive=False, include=(), exclude=()):
+    """Return the files given in paths, along with those in any directories
+    given, in the order they're listed.
+
+    With recursive set, subdirectories are searched too. Files found in
+    directories are only returned if their names match at least one of the
+    glob patterns in include (if any are given) and none of those in exclude;
+    files given directly are always returned."""
+
+    statements = []
+    for path in paths:
+        if os.path.isdir(path):
+            statements.extend(entry.path for entry in _scan_directory(path, recursive, include, exclude))
+        elif os.path.isfile(path):
+            statements.append(path)
+        else:
+            logger.warning(f"{path} is not a file")
+    return statements
+
+def scan_statements(paths, recursive=False, include=(), exclude=()):
+    """Like find_statements, but return a dict of each file to its (size,
+    mtime_ns), to tell when files have changed"""
+
+    statements = {}
+    for path in paths:
+        if os.path.isdir(path):
+            for entry in _scan_directory(path, recursive, include, exclude):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    # deleted since the directory was listed
+                    continue
+                statements[entry.path] = (st.st_size, st.st_mtime_ns)
+        elif os.path.isfile(path):
+            st = os.stat(path)
+            statements[path] = (st.st_size, st.st_mtime_ns)
+    return statements
+
+def find_duplicate_files(files):
+    """Return a dict of each file in files with exactly the same contents as
+    an earlier one, such as a statement downloaded twice, to the first file
+    with those contents.
+
+    Only files the same size as another are hashed, so usually hardly any
+    need reading. Files which can't be read are left for reading them to
+    report."""
+
+    by_size = {}
+    for file in files:
+        try:
+            by_size.setdefault(os.path.getsize(file), []).append(file)
+        except OSError:
+            continue
+
+    duplicates = {}
+    for same_size in by_size.values():
+        if len(same_size) < 2:
+            continue
+
+        originals = {}
+        for file in same_size:
+            try:
+                digest = hash_file(file)
+            except OSError:
+                continue
+            if digest in originals:
+                duplicates[file] = originals[digest]
+            else:
+                originals[digest] = file
+    return duplicates
+
+def _read_file(file):
+    with open(file, "rb") as f:
+        return f.read()
+
+def _read_statement_file(file):
+    """Read a file's contents, or return the StatementParseError raised by
+    sniffing it if it clearly isn't a statement, without reading the rest of
+    it. The OSError is returned if the file can't be read, e.g. if it's been
+    moved since it was found."""
+
+    try:
+        with open(file, "rb") as f:
+            data = f.read(SNIFF_SIZE)
+            try:
+                sniff_statement(os.path.basename(file), data)
+            except StatementParseError as e:
+                return e
+            return data + f.read()
+    except OSError as e:
+        return e
+
+def prefetch_files(files, concurrency, read=_read_file):
+    """Yield (file, read(file)) for each file in order, with up to concurrency
+    files being read ahead in a thread pool while earlier ones are processed.
+
+    This hides per-file latency on slow filesystems, where it would otherwise
+    dominate. Errors reading a file are raised when it's reached."""
+
+    files = iter(files)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = collections.deque((file, executor.submit(read, file)) for file in itertools.islice(files, concurrency))
+        while pending:
+            file, future = pending.popleft()
+            # keep the pool busy while this file is processed
+            for next_file in itertools.islice(files, 1):
+                pending.append((next_file, executor.submit(read, next_file)))
+            with STATS.timer("prefetch_wait"):
+                data = future.result()
+            yield (file, data)
+
+def _record_read(file, read, *args):
+    """Call read(*args) to parse a statement, returning its result or the
+    StatementParseError or OSError it raised, and record how long it took"""
+
+    start = time.perf_counter()
+    try:
+        result = read(*args)
+    except UnrecognisedFileError as e:
+        STATS.count("files_skipped")
+        return e
+    except StatementParseError as e:
+        STATS.count("parse_errors")
+        return e
+    except OSError as e:
+        STATS.count("read_errors")
+        return e
+    seconds = time.perf_counter() - start
+
+    STATS.add_time("parse", seconds)
+    STATS.count("rows_parsed", len(result[1]))
+    STATS.add_file(file, len(result[1]), seconds)
+    return result
+
+def _read_statement(file):
+    """Read a single statement, returning either the (account_name,
+    transactions) tuple or the StatementParseError or OSError raised while
+    reading.
+
+    Errors are returned rather than raised so one bad file doesn't cancel the
+    rest of a batch running in a process pool, or stop a watch when a file
+    vanishes between being found and read."""
+
+    return _record_read(file, read_nationwide_file, file)
+
+def _read_statement_with_stats(file):
+    return collect_stats(_read_statement, file)
+
+def _read_statement_bytes(file, data):
+    if isinstance(data, UnrecognisedFileError):
+        STATS.count("files_skipped")
+        return data
+    if isinstance(data, StatementParseError):
+        STATS.count("parse_errors")
+        return data
+    if isinstance(data, OSError):
+        STATS.count("read_errors")
+        return data
+
+    return _record_read(file, read_nationwide_bytes, file, data)
+
+def _read_uncached_statements(files, jobs, prefetch):
+    if jobs <= 1 or len(files) <= 1:
+        if prefetch > 0 and len(files) > 1:
+            for file, data in prefetch_files(files, prefetch, _read_statement_file):
+                yield (file, _read_statement_bytes(file, data))
+        else:
+            for file in files:
+                yield (file, _read_statement(file))
+        return
+
+    logger.debug(f"Reading {len(files)} files with {jobs} worker processes")
+
+    # a few files per task keeps IPC overhead down without starving workers
+    chunksize = max(1, len(files) // (jobs * 4))
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for file, (result, stats) in zip(files, executor.map(_read_statement_with_stats, files, chunksize=chunksize)):
+            STATS.add_dict(stats)
+            yield (file, result)
+
+def read_statements(files, jobs=1, cache=None, prefetch=0):
+    """Read statements, yielding (file, result) tuples in the same order as
+    files, where result is as returned by _read_statement.
+
+    With jobs > 1 files are parsed in a pool of worker processes, but results
+    are still yielded in input order so anything consuming them behaves
+    exactly as it would for a serial run. Otherwise, with prefetch > 0, up to
+    that many files are read ahead in background threads while earlier ones
+    are parsed.
+
+    If a StatementCache is given, cached results are used where available and
+    successfully parsed statements are added to it."""
+
+    if cache is None:
+        yield from _read_uncached_statements(files, jobs, prefetch)
+        return
+
+    cached_results = [cache.get(file) for file in files]
+    uncached_files = [file for file, result in zip(files, cached_results) if result is None]
+    logger.debug(f"Found {len(files) - len(uncached_files)}/{len(files)} statements in cache")
+
+    uncached_results = _read_uncached_statements(uncached_files, jobs, prefetch)
+    for file, result in zip(files, cached_results):
+        if result is None:
+            _, result = next(uncached_results)
+            if not isinstance(result, Exception):
+                cache.put(file, result)
+        yield (file, result)
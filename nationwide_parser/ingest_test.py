@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.ingest import find_duplicate_files, find_statements, prefetch_files, read_statements, scan_statements
+from nationwide_parser.statement import StatementParseError
+
+
+TEST_DATA_DIR = "fixtures"
+
+class TestReadStatements(unittest.TestCase):
+    def setUp(self):
+        self.infiles = [os.path.join(TEST_DATA_DIR, f) for f in sorted(os.listdir(TEST_DATA_DIR))]
+
+    def test_serial_read(self):
+        results = list(read_statements(self.infiles))
+
+        self.assertEqual([r[0] for r in results], self.infiles)
+        for file, result in results:
+            if os.path.basename(file).startswith("bad-") or file.endswith(".txt"):
+                self.assertIsInstance(result, StatementParseError)
+            else:
+                self.assertIsInstance(result, tuple)
+
+    def test_parallel_read_matches_serial(self):
+        serial = list(read_statements(self.infiles))
+        parallel = list(read_statements(self.infiles, jobs=2))
+
+        self.assertEqual(len(serial), len(parallel))
+        for (s_file, s_result), (p_file, p_result) in zip(serial, parallel):
+            self.assertEqual(s_file, p_file)
+            if isinstance(s_result, StatementParseError):
+                self.assertIsInstance(p_result, StatementParseError)
+                self.assertEqual(str(s_result), str(p_result))
+            else:
+                self.assertEqual(s_result, p_result)
+
+    def test_prefetched_read_matches_serial(self):
+        serial = list(read_statements(self.infiles))
+        prefetched = list(read_statements(self.infiles, prefetch=3))
+
+        self.assertEqual([r[0] for r in serial], [r[0] for r in prefetched])
+        for (_, s_result), (_, p_result) in zip(serial, prefetched):
+            if isinstance(s_result, StatementParseError):
+                self.assertIsInstance(p_result, StatementParseError)
+                self.assertEqual(str(s_result), str(p_result))
+            else:
+                self.assertEqual(s_result, p_result)
+
+    def test_prefetch_files(self):
+        results = list(prefetch_files(self.infiles, 2))
+
+        self.assertEqual([r[0] for r in results], self.infiles)
+        for file, data in results:
+            with open(file, "rb") as f:
+                self.assertEqual(data, f.read())
+
+        with self.assertRaises(FileNotFoundError):
+            list(prefetch_files(self.infiles + ["does-not-exist.csv"], 2))
+
+class TestFindStatements(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path in ["a.csv", "b.txt", "sub/c.csv", "sub/deeper/d.csv", "sub/e.csv.bak"]:
+            path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def found(self, *args, **kwargs):
+        return sorted(os.path.relpath(f, self.root) for f in find_statements(*args, **kwargs))
+
+    def test_find_statements(self):
+        self.assertEqual(self.found([self.root]), ["a.csv", "b.txt"])
+        self.assertEqual(self.found([self.root], recursive=True), ["a.csv", "b.txt", "sub/c.csv", "sub/deeper/d.csv", "sub/e.csv.bak"])
+
+    def test_patterns(self):
+        self.assertEqual(self.found([self.root], recursive=True, include=["*.csv"]), ["a.csv", "sub/c.csv", "sub/deeper/d.csv"])
+        self.assertEqual(self.found([self.root], recursive=True, include=["*.csv", "*.txt"], exclude=["d*"]), ["a.csv", "b.txt", "sub/c.csv"])
+        self.assertEqual(self.found([self.root], exclude=["*.txt"]), ["a.csv"])
+
+    def test_files_and_missing_paths(self):
+        b_txt = os.path.join(self.root, "b.txt")
+        with self.assertLogs("nationwide_parser.ingest", "WARNING"):
+            statements = find_statements([b_txt, os.path.join(self.root, "missing")], include=["*.csv"])
+        self.assertEqual(statements, [b_txt])
+
+    def test_scan_statements(self):
+        scanned = scan_statements([self.root], recursive=True, include=["*.csv"])
+        self.assertEqual(sorted(scanned), sorted(find_statements([self.root], recursive=True, include=["*.csv"])))
+
+        a_csv = os.path.join(self.root, "a.csv")
+        with open(a_csv, "w") as f:
+            f.write("changed")
+        self.assertEqual(scan_statements([a_csv])[a_csv][0], len("changed"))
+
+    def test_find_duplicate_files(self):
+        contents = {"a.csv": "statement", "b.txt": "statement", "sub/c.csv": "different", "sub/deeper/d.csv": "statement", "sub/e.csv.bak": "other"}
+        for path, content in contents.items():
+            with open(os.path.join(self.root, path), "w") as f:
+                f.write(content)
+
+        files = [os.path.join(self.root, path) for path in contents] + [os.path.join(self.root, "missing.csv")]
+        a_csv = os.path.join(self.root, "a.csv")
+        self.assertEqual(find_duplicate_files(files), {
+                os.path.join(self.root, "b.txt"): a_csv,
+                os.path.join(self.root, "sub/deeper/d.csv"): a_csv,
+                })
@@ -0,0 +1,366 @@
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import stat
+import sys
+import tempfile
+
+from nationwide_parser.utils import decimalise, isoformat
+
+
+logger = logging.getLogger(__name__)
+
+LEDGER_HEADER = """option "operating_currency" "GBP"
+
+2000-01-01 open Income:Unknown
+2000-01-01 open Expenses:Unknown
+2000-01-01 open Equity:Opening-Balances
+
+"""
+
+CLOSING_BALANCES_HEADER = "; closing balances\n"
+
+# bump when the ledger layout or state file changes
+STATE_VERSION = 1
+
+# characters of rendered text to buffer before writing
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+def beancount_account_name(account_name):
+    return f"Assets:{account_name.removeprefix('****')}"
+
+class RenderCache:
+    """Rendered transactions of each account, by the date, amount and
+    description they're rendered from.
+
+    Rendering a transaction already in the cache is just a lookup, so
+    rewriting a ledger from accounts held in memory, as when watching for
+    statements, only formats the transactions which are new. Entries are
+    never evicted, so the cache grows to the size of the ledger."""
+
+    def __init__(self):
+        self._accounts = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._accounts.values())
+
+    def entries(self, bc_name):
+        """Return the dict of rendered transactions for an account"""
+
+        return self._accounts.setdefault(bc_name, {})
+
+def _render_transactions(transactions, bc_name, cache=None):
+    """Yield each transaction rendered by Transaction.to_beancount, preceded
+    by a blank line, using and filling cache if given"""
+
+    if cache is None:
+        for t in transactions:
+            yield "\n" + t.to_beancount(bc_name)
+        return
+
+    entries = cache.entries(bc_name)
+    for t in transactions:
+        key = (t.date, t.amount, t.description)
+        rendered = entries.get(key)
+        if rendered is None:
+            rendered = entries[key] = "\n" + t.to_beancount(bc_name)
+        yield rendered
+
+class LedgerWriter:
+    """Renders accounts into a text file, buffering rendered text and writing
+    it out in chunks of roughly buffer_size characters.
+
+    Transactions are rendered through render_cache if it's a RenderCache."""
+
+    def __init__(self, f, buffer_size=DEFAULT_BUFFER_SIZE, render_cache=None):
+        self._file = f
+        self.buffer_size = buffer_size
+        self.render_cache = render_cache
+        self._chunks = []
+        self._buffered = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._chunks:
+            self._file.write("".join(self._chunks))
+            self._chunks = []
+            self._buffered = 0
+
+    def tell(self):
+        self.flush()
+        return self._file.tell()
+
+    def write_header(self):
+        self.write(LEDGER_HEADER)
+
+    def write_account_opening(self, account):
+        bc_name = beancount_account_name(account.name)
+        self.write(f"2000-01-01 open {bc_name}\n")
+
+        # accounts kept in a store may have no transactions
+        if len(account.transactions) == 0:
+            return
+
+        first_txn = account.transactions[0]
+        opening_balance = first_txn.closing_balance - first_txn.amount
+        if opening_balance != 0:
+            self.write(f"""2000-01-01 pad {bc_name} Equity:Opening-Balances
+{isoformat(first_txn.date)} balance {bc_name} {decimalise(opening_balance)} GBP
+""")
+
+    def write_transactions(self, account, start=0):
+        """Write an account's transactions from index start onwards"""
+
+        transactions = account.transactions
+        if start > 0:
+            transactions = transactions[start:]
+
+        chunks = self._chunks
+        for rendered in _render_transactions(transactions, beancount_account_name(account.name), self.render_cache):
+            chunks.append(rendered)
+            self._buffered += len(rendered)
+            if self._buffered >= self.buffer_size:
+                self.flush()
+                chunks = self._chunks
+        self.write("\n")
+
+    def write_account(self, account):
+        self.write_account_opening(account)
+        self.write_transactions(account)
+
+    def write_closing_balance(self, account):
+        if len(account.transactions) == 0:
+            return
+
+        bc_name = beancount_account_name(account.name)
+        last_txn = account.transactions[-1]
+        self.write(f"{isoformat(last_txn.date + datetime.timedelta(days=1))} balance {bc_name} {decimalise(last_txn.closing_balance)} GBP\n")
+
+    def write_closing_balances(self, accounts):
+        self.write(CLOSING_BALANCES_HEADER)
+        for x in accounts:
+            self.write_closing_balance(accounts[x])
+
+def render_account(account):
+    """Return an account's ledger section, as written by
+    LedgerWriter.write_account, as a string"""
+
+    f = io.StringIO()
+    writer = LedgerWriter(f)
+    writer.write_account(account)
+    writer.flush()
+    return f.getvalue()
+
+def _new_file_mode(path):
+    """Return the permissions a file created by open() at path would have,
+    or the existing permissions if it already exists"""
+
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+@contextlib.contextmanager
+def open_ledger(ledger_file, buffer_size=DEFAULT_BUFFER_SIZE, render_cache=None):
+    """Open a LedgerWriter for a new ledger.
+
+    A ledger_file of "-" writes to stdout. Otherwise the ledger is written to
+    a temporary file which only replaces ledger_file once complete, so an
+    existing ledger is never left half written."""
+
+    if ledger_file == "-":
+        writer = LedgerWriter(sys.stdout, buffer_size, render_cache)
+        yield writer
+        writer.flush()
+        return
+
+    ledger_dir = os.path.dirname(os.path.abspath(ledger_file))
+    fd, tmp_path = tempfile.mkstemp(dir=ledger_dir, prefix=f".{os.path.basename(ledger_file)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            writer = LedgerWriter(f, buffer_size, render_cache)
+            yield writer
+            writer.flush()
+        os.chmod(tmp_path, _new_file_mode(ledger_file))
+        os.replace(tmp_path, ledger_file)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def state_file_name(ledger_file):
+    return f"{ledger_file}.state"
+
+def _account_state(account):
+    if len(account.transactions) == 0:
+        return {"count": 0}
+
+    first_txn = account.transactions[0]
+    last_txn = account.transactions[-1]
+    return {
+            "count": len(account.transactions),
+            "first_date": first_txn.date.isoformat(),
+            "opening_balance": first_txn.closing_balance - first_txn.amount,
+            "last_date": last_txn.date.isoformat(),
+            "closing_balance": last_txn.closing_balance,
+            }
+
+def _write_state(ledger_file, accounts, closing_balances_offset):
+    state = {
+            "version": STATE_VERSION,
+            "ledger_size": os.path.getsize(ledger_file),
+            "closing_balances_offset": closing_balances_offset,
+            "accounts": {x: _account_state(accounts[x]) for x in accounts},
+            }
+    with open(state_file_name(ledger_file), "w") as f:
+        json.dump(state, f, indent=1)
+
+def _read_state(ledger_file):
+    try:
+        with open(state_file_name(ledger_file)) as f:
+            state = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    if state.get("version") != STATE_VERSION:
+        return None
+    return state
+
+def write_ledger(ledger_file, accounts, save_state=False, buffer_size=DEFAULT_BUFFER_SIZE, rendered=None, render_cache=None):
+    """Write a complete ledger for a dict of Accounts.
+
+    Each account gets a section with its opening balance, transactions and
+    closing balance. If save_state is set, the closing balances are instead
+    written in a block at the end of the file, so that update_ledger can later
+    append to the ledger without invalidating them, and a sidecar state file
+    is written for it. Otherwise any existing state file is removed, as it
+    would no longer describe the ledger.
+
+    rendered may be a dict of account names to sections already rendered by
+    render_account, which are written instead of rendering them again, and
+    render_cache a RenderCache to render the others through."""
+
+    if save_state and ledger_file == "-":
+        raise ValueError("Cannot save the state of a ledger written to stdout")
+
+    with open_ledger(ledger_file, buffer_size, render_cache) as writer:
+        writer.write_header()
+        for x in accounts:
+            if rendered is not None and x in rendered:
+                writer.write(rendered[x])
+            else:
+                writer.write_account(accounts[x])
+            if not save_state:
+                writer.write_closing_balance(accounts[x])
+                writer.write("\n")
+
+        if save_state:
+            closing_balances_offset = writer.tell()
+            writer.write_closing_balances(accounts)
+
+    if ledger_file == "-":
+        return
+
+    if save_state:
+        _write_state(ledger_file, accounts, closing_balances_offset)
+    elif os.path.exists(state_file_name(ledger_file)):
+        os.remove(state_file_name(ledger_file))
+
+def _new_transactions_start(account, account_state):
+    """Return the index of the first transaction in account after the ones
+    recorded in account_state, or None if the account's earlier history no
+    longer matches it"""
+
+    transactions = account.transactions
+    count = account_state["count"]
+    if len(transactions) < count:
+        return None
+
+    # an account written without transactions has no opening balance to follow
+    if count == 0:
+        return 0 if len(transactions) == 0 else None
+
+    first_txn = transactions[0]
+    if first_txn.date.isoformat() != account_state["first_date"] or first_txn.closing_balance - first_txn.amount != account_state["opening_balance"]:
+        return None
+
+    # if anything was inserted before the old high-water mark, it will have moved
+    last_txn = transactions[count - 1]
+    if last_txn.date.isoformat() != account_state["last_date"] or last_txn.closing_balance != account_state["closing_balance"]:
+        return None
+
+    return count
+
+def update_ledger(ledger_file, accounts, buffer_size=DEFAULT_BUFFER_SIZE, render_cache=None):
+    """Bring a ledger written by write_ledger up to date with a dict of
+    Accounts, returning True if this could be done by appending to it, or
+    False if it had to be rewritten from scratch.
+
+    Appending is possible when every previously written account has only
+    gained transactions after its last one (new accounts are fine too). The
+    new transactions are appended to the ledger after any previous ones, and
+    the closing balances block is rewritten to follow them.
+
+    render_cache is passed on to write_ledger when rewriting, as that's when
+    most of the transactions rendered will have been rendered before."""
+
+    state = _read_state(ledger_file)
+
+    if state is None or not os.path.exists(ledger_file) or os.path.getsize(ledger_file) != state["ledger_size"]:
+        logger.info(f"No usable state for {ledger_file}; rewriting it")
+        write_ledger(ledger_file, accounts, save_state=True, buffer_size=buffer_size, render_cache=render_cache)
+        return False
+
+    if any(x not in accounts for x in state["accounts"]):
+        logger.info(f"Accounts have been removed from {ledger_file}; rewriting it")
+        write_ledger(ledger_file, accounts, save_state=True, buffer_size=buffer_size, render_cache=render_cache)
+        return False
+
+    # work out what to append before touching the ledger
+    starts = {}
+    for x in accounts:
+        if x not in state["accounts"]:
+            starts[x] = None
+            continue
+
+        starts[x] = _new_transactions_start(accounts[x], state["accounts"][x])
+        if starts[x] is None:
+            logger.info(f"History of account {x} has changed; rewriting {ledger_file}")
+            write_ledger(ledger_file, accounts, save_state=True, buffer_size=buffer_size, render_cache=render_cache)
+            return False
+
+    # appending happens in place, as copying the ledger would defeat the point
+    num_appended = 0
+    f = open(ledger_file, "r+")
+    f.seek(state["closing_balances_offset"])
+    f.truncate()
+    writer = LedgerWriter(f, buffer_size, render_cache)
+
+    for x in accounts:
+        if starts[x] is None:
+            logger.debug(f"Appending new account {x}")
+            writer.write_account(accounts[x])
+            num_appended += len(accounts[x].transactions)
+        elif starts[x] < len(accounts[x].transactions):
+            writer.write(f"\n; {x} continued\n")
+            writer.write_transactions(accounts[x], starts[x])
+            num_appended += len(accounts[x].transactions) - starts[x]
+
+    closing_balances_offset = writer.tell()
+    writer.write_closing_balances(accounts)
+    writer.flush()
+    f.close()
+
+    _write_state(ledger_file, accounts, closing_balances_offset)
+    logger.info(f"Appended {num_appended} transactions to {ledger_file}")
+    return True
@@ -0,0 +1,182 @@
+from datetime import date
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.account import Account, load_accounts, save_accounts
+from nationwide_parser.ledger import RenderCache, beancount_account_name, render_account, state_file_name, update_ledger, write_ledger
+from nationwide_parser.transaction import Transaction
+
+
+def _accounts(extra_transactions=[]):
+    return {
+        "****11111": Account("****11111", [
+            Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+            Transaction(date(2025, 2, 2), 99, "abc", "xyz", 1100),
+            ] + extra_transactions),
+        "****22222": Account("****22222", [
+            Transaction(date(2025, 3, 1), -50, "abc", "xyz", 50),
+            ]),
+        }
+
+class TestLedger(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.ledger_file = os.path.join(self.output_dir, "test.beancount")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def read_ledger(self):
+        with open(self.ledger_file) as f:
+            return f.read()
+
+    def test_prerendered_sections(self):
+        write_ledger(self.ledger_file, _accounts())
+        expected = self.read_ledger()
+
+        accounts = _accounts()
+        write_ledger(self.ledger_file, accounts, rendered={x: render_account(accounts[x]) for x in accounts})
+        self.assertEqual(self.read_ledger(), expected)
+
+    def test_write_ledger(self):
+        write_ledger(self.ledger_file, _accounts())
+        ledger = self.read_ledger()
+
+        self.assertTrue(ledger.startswith('option "operating_currency" "GBP"\n'))
+        self.assertIn("2000-01-01 open Assets:11111\n", ledger)
+        self.assertIn("2025-02-01 balance Assets:11111 10.00 GBP\n", ledger)
+        self.assertIn('2025-02-02 * "xyz" ""\n  Assets:11111 0.99 GBP\n  Income:Unknown -0.99 GBP\n', ledger)
+        self.assertIn("\n2025-02-03 balance Assets:11111 11.00 GBP\n\n2000-01-01 open Assets:22222\n", ledger)
+        self.assertTrue(ledger.endswith("\n2025-03-02 balance Assets:22222 0.50 GBP\n\n"))
+        self.assertNotIn("; closing balances", ledger)
+        self.assertFalse(os.path.exists(state_file_name(self.ledger_file)))
+
+    def test_write_ledger_with_state(self):
+        write_ledger(self.ledger_file, _accounts(), save_state=True)
+        ledger = self.read_ledger()
+
+        # closing balances go at the end, where they can follow appended transactions
+        self.assertTrue(ledger.endswith("; closing balances\n2025-02-03 balance Assets:11111 11.00 GBP\n2025-03-02 balance Assets:22222 0.50 GBP\n"))
+        self.assertTrue(os.path.exists(state_file_name(self.ledger_file)))
+
+    def test_transactions_match_to_beancount(self):
+        transactions = [
+            Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+            Transaction(date(2025, 2, 2), -12345, "abc", "xyz", -11344),
+            Transaction(date(2025, 2, 3), 0, "abc", "xyz", -11344),
+            ]
+        accounts = {"****11111": Account("****11111", transactions)}
+
+        # a tiny buffer makes sure flushing mid-account works
+        write_ledger(self.ledger_file, accounts, buffer_size=10)
+        bc_name = beancount_account_name("****11111")
+        self.assertIn("".join("\n" + t.to_beancount(bc_name) for t in transactions), self.read_ledger())
+
+    def test_render_cache(self):
+        write_ledger(self.ledger_file, _accounts())
+        expected = self.read_ledger()
+
+        cache = RenderCache()
+        write_ledger(self.ledger_file, _accounts(), render_cache=cache)
+        self.assertEqual(self.read_ledger(), expected)
+        self.assertEqual(len(cache), 3)
+
+        # cached entries are reused, and new transactions are added
+        accounts = _accounts([Transaction(date(2025, 2, 3), -100, "abc", "xyz", 1000)])
+        write_ledger(self.ledger_file, accounts, render_cache=cache)
+        write_ledger(self.ledger_file + ".uncached", accounts)
+        with open(self.ledger_file + ".uncached") as f:
+            self.assertEqual(self.read_ledger(), f.read())
+        self.assertEqual(len(cache), 4)
+
+    def test_failed_write_keeps_ledger(self):
+        write_ledger(self.ledger_file, _accounts())
+        ledger = self.read_ledger()
+
+        accounts = _accounts()
+        accounts["****33333"] = Account("****33333", [None])
+        with self.assertRaises(AttributeError):
+            write_ledger(self.ledger_file, accounts)
+        self.assertEqual(self.read_ledger(), ledger)
+        self.assertEqual(os.listdir(self.output_dir), ["test.beancount"])
+
+    def test_update_without_state_rewrites(self):
+        self.assertFalse(update_ledger(self.ledger_file, _accounts()))
+        self.assertTrue(os.path.exists(state_file_name(self.ledger_file)))
+
+        ledger = self.read_ledger()
+        write_ledger(self.ledger_file, _accounts(), save_state=True)
+        self.assertEqual(self.read_ledger(), ledger)
+
+    def test_update_unchanged(self):
+        update_ledger(self.ledger_file, _accounts())
+        ledger = self.read_ledger()
+
+        self.assertTrue(update_ledger(self.ledger_file, _accounts()))
+        self.assertEqual(self.read_ledger(), ledger)
+
+    def test_update_appends(self):
+        update_ledger(self.ledger_file, _accounts())
+        ledger = self.read_ledger()
+
+        new_transaction = Transaction(date(2025, 2, 2), -100, "abc", "new", 1000)
+        self.assertTrue(update_ledger(self.ledger_file, _accounts([new_transaction])))
+        updated_ledger = self.read_ledger()
+
+        self.assertTrue(updated_ledger.startswith(ledger[:ledger.index("; closing balances")]))
+        self.assertIn('2025-02-02 * "new" ""\n', updated_ledger)
+        self.assertEqual(updated_ledger.count("; closing balances"), 1)
+        self.assertIn("2025-02-03 balance Assets:11111 10.00 GBP\n", updated_ledger)
+        self.assertNotIn("2025-02-03 balance Assets:11111 11.00 GBP\n", updated_ledger)
+
+    def test_update_new_account(self):
+        update_ledger(self.ledger_file, _accounts())
+
+        accounts = _accounts()
+        accounts["****33333"] = Account("****33333", [Transaction(date(2025, 1, 1), 5, "abc", "xyz", 5)])
+        self.assertTrue(update_ledger(self.ledger_file, accounts))
+        self.assertIn("2000-01-01 open Assets:33333\n", self.read_ledger())
+
+    def test_update_changed_history_rewrites(self):
+        update_ledger(self.ledger_file, _accounts())
+
+        accounts = _accounts()
+        accounts["****11111"].transactions.insert(0, Transaction(date(2025, 1, 1), 1000, "abc", "xyz", 1000))
+        self.assertFalse(update_ledger(self.ledger_file, accounts))
+
+        ledger = self.read_ledger()
+        write_ledger(self.ledger_file, accounts, save_state=True)
+        self.assertEqual(self.read_ledger(), ledger)
+
+    def test_update_edited_ledger_rewrites(self):
+        update_ledger(self.ledger_file, _accounts())
+        with open(self.ledger_file, "a") as f:
+            f.write("; edited\n")
+
+        self.assertFalse(update_ledger(self.ledger_file, _accounts()))
+        self.assertNotIn("; edited", self.read_ledger())
+
+    def test_empty_account_from_store(self):
+        # stores keep accounts with no transactions
+        accounts = _accounts()
+        accounts["****33333"] = Account("****33333", [])
+        for store_name in ["store.nwas", "store.sqlite"]:
+            store_path = os.path.join(self.output_dir, store_name)
+            save_accounts(store_path, accounts)
+            loaded = load_accounts(store_path)
+            self.assertEqual(len(loaded["****33333"].transactions), 0)
+
+            write_ledger(self.ledger_file, loaded)
+            ledger = self.read_ledger()
+            self.assertIn("2000-01-01 open Assets:33333\n", ledger)
+            self.assertNotIn("balance Assets:33333", ledger)
+
+            self.assertFalse(update_ledger(self.ledger_file, loaded))
+            self.assertTrue(update_ledger(self.ledger_file, loaded))
+
+            # the account's opening balance has to be written when it gains transactions
+            loaded["****33333"] = Account("****33333", [Transaction(date(2025, 1, 1), 5, "abc", "xyz", 10)])
+            self.assertFalse(update_ledger(self.ledger_file, loaded))
+            self.assertIn("2025-01-01 balance Assets:33333 0.05 GBP\n", self.read_ledger())
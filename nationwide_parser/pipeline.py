@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+from nationwide_parser.account import Account
+from nationwide_parser.gap_report import gap_report
+from nationwide_parser.ledger import render_account
+from nationwide_parser.stats import STATS, collect_stats
+
+
+logger = logging.getLogger(__name__)
+
+def _merge_account(name, account, statements, windows, render):
+    """Merge an account's statements into it, returning the account along
+    with its GapReport and, if render is set, its rendered ledger section"""
+
+    with STATS.timer("merge"):
+        if account is None:
+            account = Account.from_statements(name, statements)
+        elif len(statements) > 0:
+            # the account's own transactions are merged as the first statement,
+            # as the new statements may only fill some of its gaps between them
+            account = Account.from_statements(name, [account.transactions, *statements])
+    logger.debug(f"Merged {len(statements)} statements into account {name}")
+
+    with STATS.timer("gap_report"):
+        report = gap_report(account, windows)
+
+    rendered = None
+    if render:
+        with STATS.timer("render"):
+            rendered = render_account(account)
+    return (account, report, rendered)
+
+def _merge_account_job(job):
+    return _merge_account(*job)
+
+def _merge_account_job_with_stats(job):
+    return collect_stats(_merge_account, *job)
+
+def merge_accounts(accounts, statements, windows={}, jobs=1, render=False):
+    """Merge statements into accounts, yielding (account, gap report,
+    rendered ledger section or None) for each account in a stable order:
+    those in accounts first, then new ones in the order they appear in
+    statements.
+
+    accounts is a dict of existing Accounts, which may be empty, and
+    statements a dict of account names to lists of transaction lists to merge
+    in order. windows is passed to gap_report for each account.
+
+    Accounts are independent, so with jobs > 1 each is merged, checked and
+    rendered in a pool of worker processes."""
+
+    names = list(accounts) + [x for x in statements if x not in accounts]
+    job_list = [(x, accounts.get(x), statements.get(x, []), windows.get(x, []), render) for x in names]
+
+    if jobs <= 1 or len(job_list) <= 1:
+        yield from map(_merge_account_job, job_list)
+        return
+
+    logger.debug(f"Merging {len(job_list)} accounts with {jobs} worker processes")
+    with ProcessPoolExecutor(max_workers=min(jobs, len(job_list))) as executor:
+        for result, stats in executor.map(_merge_account_job_with_stats, job_list):
+            STATS.add_dict(stats)
+            yield result
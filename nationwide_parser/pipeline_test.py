@@ -0,0 +1,59 @@
+import unittest
+
+from nationwide_parser.account import Account
+from nationwide_parser.ledger import render_account
+from nationwide_parser.pipeline import merge_accounts
+from nationwide_parser.synthetic import day_start, generate_transactions
+
+
+class TestMergeAccounts(unittest.TestCase):
+    def setUp(self):
+        self.transactions = {f"****{i}": generate_transactions(300, seed=i) for i in range(1, 4)}
+
+        # each account is split into overlapping statements, given out of order
+        self.statements = {}
+        for x, transactions in self.transactions.items():
+            first_split = day_start(transactions, 100)
+            second_split = day_start(transactions, 200)
+            self.statements[x] = [transactions[first_split:], transactions[:second_split]]
+
+    def test_merge_accounts(self):
+        existing = {"****3": Account("****3", self.transactions["****3"][:50])}
+        results = list(merge_accounts(existing, self.statements, render=True))
+
+        # existing accounts come first
+        self.assertEqual([account.name for account, _, _ in results], ["****3", "****1", "****2"])
+        for account, report, rendered in results:
+            self.assertEqual(account.transactions, self.transactions[account.name])
+            self.assertTrue(report.is_complete())
+            self.assertEqual(rendered, render_account(account))
+
+    def test_statements_filling_gap(self):
+        # the stored account has a gap, which one statement fills while another,
+        # not overlapping it, extends the end
+        transactions = self.transactions["****1"]
+        splits = [day_start(transactions, i) for i in [40, 50, 100, 150, 200]]
+        stored = transactions[:splits[1]] + transactions[splits[2]:splits[3]]
+        statements = {"****1": [transactions[splits[0]:splits[2] + 10], transactions[splits[4]:]]}
+
+        fold = Account("****1", list(stored))
+        for statement in statements["****1"]:
+            fold.add_unique_transactions(list(statement))
+
+        [(account, _, _)] = merge_accounts({"****1": Account("****1", list(stored))}, statements)
+        self.assertEqual(account.transactions, fold.transactions)
+
+    def test_parallel_merge_matches_serial(self):
+        serial = list(merge_accounts({}, self.statements, render=True))
+        parallel = list(merge_accounts({}, self.statements, jobs=2, render=True))
+
+        self.assertEqual(len(serial), len(parallel))
+        for (s_account, s_report, s_rendered), (p_account, p_report, p_rendered) in zip(serial, parallel):
+            self.assertEqual(s_account.name, p_account.name)
+            self.assertEqual(s_account.transactions, p_account.transactions)
+            self.assertEqual(s_report, p_report)
+            self.assertEqual(s_rendered, p_rendered)
+
+    def test_no_rendering(self):
+        for _, _, rendered in merge_accounts({}, self.statements):
+            self.assertIsNone(rendered)
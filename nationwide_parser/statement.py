@@ -1,11 +1,16 @@
 import csv
 import datetime
 import enum
+import functools
+import io
+import itertools
 import logging
 import os
 import re
 
-from nationwide_parser.transaction import Transaction
+from nationwide_parser.continuity import iter_breaks
+from nationwide_parser.stats import STATS
+from nationwide_parser.transaction import Transaction, transaction_columns
 
 
 logger = logging.getLogger(__name__)
@@ -42,6 +47,9 @@ class StatementReader():
 
         return self._parse_raw_transaction(row)
 
+    def is_chronological(self):
+        return self._transaction_ordering == self.TransactionOrder.CHRONOLOGICAL
+
     def order(self, results):
         if self._transaction_ordering == self.TransactionOrder.CHRONOLOGICAL:
             return results
@@ -61,6 +69,15 @@ class StatementReader():
         else:
             return new_transaction.date <= previous_transaction.date
 
+# formats tried in order when detecting the format of a statement
+STATEMENT_FORMATS = []
+
+def register_statement_format(statement_format):
+    """Add a StatementReader to STATEMENT_FORMATS, returning it"""
+
+    STATEMENT_FORMATS.append(statement_format)
+    return statement_format
+
 # field parsers
 def _parse_monetary_amount(money_string):
     # check for £ with optional +/-
@@ -77,8 +94,7 @@ def _parse_monetary_amount(money_string):
         raise ValueError("Could not detect £ sign; aborting")
 
     # parse number
-    remove_full_stop = str.maketrans({".":""})
-    magnitude = int(money_string.translate(remove_full_stop)[amount_index:])
+    magnitude = int(money_string[amount_index:].replace(".", ""))
 
     # return positive/negative integer
     return sign * magnitude
@@ -86,6 +102,8 @@ def _parse_monetary_amount(money_string):
 # Midata
 _MIDATA_HEADER = '"Date","Type","Merchant/Description","Debit/Credit","Balance"'
 
+# statements repeat the same dates many times, so cache them
+@functools.lru_cache(maxsize=4096)
 def _parse_midata_date(date_string):
     # allow exceptions to crash the program while we test input data
     # expects: 13/06/2025
@@ -103,35 +121,37 @@ def _midata_parse_transaction(row):
     closing_balance = _parse_monetary_amount(row[4])
     return Transaction(date, amount, kind, description, closing_balance)
 
-Midata = StatementReader("Midata", _MIDATA_HEADER, r'"Account Number:","([^"]+)"', _midata_parse_transaction, StatementReader.TransactionOrder.REVERSE_CHRONOLOGICAL)
+Midata = register_statement_format(StatementReader("Midata", _MIDATA_HEADER, r'"Account Number:","([^"]+)"', _midata_parse_transaction, StatementReader.TransactionOrder.REVERSE_CHRONOLOGICAL))
 
 
 # Nationwide
 _NATIONWIDE_HEADER = '"Date","Transaction type","Description","Paid out","Paid in","Balance"'
 
+# awkward
+_NATIONWIDE_MONTHS = {
+        "Jan": 1,
+        "Feb": 2,
+        "Mar": 3,
+        "Apr": 4,
+        "May": 5,
+        "Jun": 6,
+        "Jul": 7,
+        "Aug": 8,
+        "Sep": 9,
+        "Oct": 10,
+        "Nov": 11,
+        "Dec": 12,
+        }
+
+@functools.lru_cache(maxsize=4096)
 def _parse_nationwide_date(date_string):
     # allow exceptions to crash the program while we test input data
     # expects: 13 Jun 2025
     day = int(date_string[0:2])
     year = int(date_string[7:])
 
-    # awkward
-    month_mappings = {
-            "Jan": 1,
-            "Feb": 2,
-            "Mar": 3,
-            "Apr": 4,
-            "May": 5,
-            "Jun": 6,
-            "Jul": 7,
-            "Aug": 8,
-            "Sep": 9,
-            "Oct": 10,
-            "Nov": 11,
-            "Dec": 12,
-            }
     month_string = date_string[3:6]
-    month = month_mappings[month_string]
+    month = _NATIONWIDE_MONTHS[month_string]
 
     return datetime.date(year, month, day)
 
@@ -153,7 +173,7 @@ def _nationwide_parse_transaction(row):
 
     return Transaction()
 
-Nationwide = StatementReader("Nationwide statement", _NATIONWIDE_HEADER, r'"Account Name:","[^"*]*(\*+\d+)"', _nationwide_parse_transaction, StatementReader.TransactionOrder.CHRONOLOGICAL)
+Nationwide = register_statement_format(StatementReader("Nationwide statement", _NATIONWIDE_HEADER, r'"Account Name:","[^"*]*(\*+\d+)"', _nationwide_parse_transaction, StatementReader.TransactionOrder.CHRONOLOGICAL))
 
 class StatementParseError(Exception):
     """Raised when a file can't be parsed into a name and list of
@@ -161,6 +181,44 @@ class StatementParseError(Exception):
 
     pass
 
+class UnrecognisedFileError(StatementParseError):
+    """Raised when a file isn't a statement of any known format at all"""
+
+    pass
+
+# bytes from the start of a file used to classify it
+SNIFF_SIZE = 512
+
+def sniff_statement(file_basename, data):
+    """Classify a file from its first SNIFF_SIZE bytes (or fewer if it's
+    shorter), returning its StatementReader format and account name.
+
+    Binary files and anything whose first line doesn't look like the start of
+    a registered statement format raise UnrecognisedFileError, so they can be
+    skipped without any further reading or parsing."""
+
+    if len(data) == 0:
+        raise StatementParseError(f'"{file_basename}" is empty')
+
+    data = data[:SNIFF_SIZE]
+    if b"\0" in data:
+        raise UnrecognisedFileError(f'"{file_basename}" is not a text file')
+
+    # statements start with a short line, so the first line should fit
+    line_end = data.find(b"\n")
+    if line_end == -1 and len(data) == SNIFF_SIZE:
+        raise UnrecognisedFileError(f'Could not detect a statement format for "{file_basename}"')
+    line = data[:line_end + 1 if line_end != -1 else len(data)].decode("latin_1")
+
+    # try getting account name from first line only
+    for statement_format in STATEMENT_FORMATS:
+        account_name = statement_format.get_account_description(line)
+        if account_name is not None:
+            logger.debug('Detected format %s for "%s"', statement_format, file_basename)
+            return (statement_format, account_name)
+
+    raise UnrecognisedFileError(f'Could not detect a statement format for "{file_basename}"')
+
 def append_transaction(statement_format, transaction_list, new_transaction):
     """Append a transaction to a nonempty list of transactions, accounting for edge cases with interest payments.
 
@@ -176,7 +234,8 @@ def append_transaction(statement_format, transaction_list, new_transaction):
         redated_new_transaction = new_transaction.redate(transaction_list[-1].date)
         if statement_format.validate(transaction_list[-1], redated_new_transaction):
             transaction_list.append(redated_new_transaction)
-            logger.debug(f"Appended transaction {redated_new_transaction} after redating it from {new_transaction.date} to {redated_new_transaction.date}")
+            STATS.count("interest_redates")
+            logger.debug("Appended transaction %s after redating it from %s to %s", redated_new_transaction, new_transaction.date, redated_new_transaction.date)
             return True
 
     # if the last existing transaction is interest, try redating it
@@ -188,7 +247,8 @@ def append_transaction(statement_format, transaction_list, new_transaction):
             original_interest_date = transaction_list[-1].date
             transaction_list[-1] = redated_existing_transaction
             transaction_list.append(new_transaction)
-            logger.debug(f"Appended transaction {new_transaction} after redating prior interest transaction from {original_interest_date} to {redated_existing_transaction.date}")
+            STATS.count("interest_redates")
+            logger.debug("Appended transaction %s after redating prior interest transaction from %s to %s", new_transaction, original_interest_date, redated_existing_transaction.date)
             return True
 
     # out of ideas
@@ -201,7 +261,7 @@ def insert_interest_transaction(statement_format, transaction_list, new_transact
 
     # validation
     if target_index == 0 or target_index > len(transaction_list):
-        logger.warn(f"Attempted to insert a transaction at invalid index {target_index} - transaction_list length is {len(transaction_list)}")
+        logger.warning("Attempted to insert a transaction at invalid index %s - transaction_list length is %s", target_index, len(transaction_list))
         return False
 
     # delegate to append if applicable
@@ -212,43 +272,43 @@ def insert_interest_transaction(statement_format, transaction_list, new_transact
     maybe_transaction = new_transaction.copy()
     if not (statement_format.date_ordering_is_valid(transaction_list[target_index - 1], maybe_transaction) and statement_format.date_ordering_is_valid(maybe_transaction, transaction_list[target_index])):
         maybe_transaction = maybe_transaction.redate(min(transaction_list[target_index - 1].date, transaction_list[target_index].date))
-        logger.debug(f"Redating transaction to {maybe_transaction.date} before attempting insertion")
+        STATS.count("interest_redates")
+        logger.debug("Redating transaction to %s before attempting insertion", maybe_transaction.date)
 
     if statement_format.validate(transaction_list[target_index - 1], maybe_transaction) and statement_format.validate(maybe_transaction, transaction_list[target_index]):
         transaction_list.insert(target_index, maybe_transaction)
-        logger.debug(f"Successfully inserted transaction {maybe_transaction}")
+        STATS.count("interest_reorders")
+        logger.debug("Successfully inserted transaction %s", maybe_transaction)
         return True
 
     # out of ideas
     return False
 
-def read_nationwide_file(file):
-    file_basename = os.path.basename(file)
-    logger.debug(f'Reading file "{file_basename}"')
+# number of reconciled transactions to hold back while streaming, so that
+# reordering interest payments never has to touch anything already yielded
+_STREAM_WINDOW = 64
 
-    # Nationwide exports files encoded with ISO-8859-1, using CRLF terminators
-    f = open(file, encoding="latin_1")
+# number of rows parsed before their balances are checked together
+_RECONCILE_BLOCK = 256
 
-    # check file not empty
-    line = f.readline()
-    if line == "": # EOF
-        f.close()
-        raise StatementParseError(f'"{file_basename}" is empty')
+def _open_statement(file):
+    """Open a statement and skip to the start of its transaction data,
+    returning the open file, its statement format and account name."""
 
-    # try getting account name from first line only
-    statement_formats = [ Midata, Nationwide ]
-    statement_format = None
+    file_basename = os.path.basename(file)
+    logger.debug('Reading file "%s"', file_basename)
 
-    for fmt in statement_formats:
-        account_name = fmt.get_account_description(line)
-        if account_name is not None:
-            statement_format = fmt
-            logger.debug(f'Detected format {statement_format} for "{file_basename}"')
-            break
+    raw = open(file, "rb")
+    try:
+        statement_format, account_name = sniff_statement(file_basename, raw.read(SNIFF_SIZE))
+    except StatementParseError:
+        raw.close()
+        raise
+    raw.seek(0)
 
-    if statement_format is None:
-        f.close()
-        raise StatementParseError(f'Could not detect a statement format for "{file_basename}"')
+    # Nationwide exports files encoded with ISO-8859-1, using CRLF terminators
+    f = io.TextIOWrapper(raw, encoding="latin_1")
+    f.readline()
 
     # skip through lines until we hit the CSV header
     while (True):
@@ -257,103 +317,186 @@ def read_nationwide_file(file):
             f.close()
             raise StatementParseError(f'Could not detect start of transaction data for "{file_basename}"')
         elif line.strip() == statement_format.header:
-            logger.debug(f'Detected start of transaction data for "{file_basename}"')
+            logger.debug('Detected start of transaction data for "%s"', file_basename)
             break
 
-    # parse rest of file as CSV
-    c = csv.reader(f)
+    return (f, statement_format, account_name)
+
+def _chain_breaks(statement_format, transactions):
+    """Return a sorted list of each index i where transactions[i] doesn't
+    follow transactions[i - 1] in statement order, checking the whole balance
+    chain at once over integer columns rather than calling validate per row"""
+
+    if statement_format.is_chronological():
+        return list(iter_breaks(*transaction_columns(transactions)))
+
+    # check reverse chronological transactions backwards, where a break at j
+    # is between statement indices n - j - 1 and n - j
+    n = len(transactions)
+    return [n - j for j in reversed(list(iter_breaks(*transaction_columns(transactions[::-1]))))]
+
+def _reconcile_transactions(statement_format, rows):
+    """Parse and reconcile rows of a statement, yielding transactions in
+    statement order once no later row can cause them to be reordered or
+    redated.
+
+    Rows are parsed in blocks of _RECONCILE_BLOCK, and the balance chain of
+    each block is checked in one pass with _chain_breaks. Runs of transactions
+    which follow each other are appended as they are, and only those where
+    the chain breaks go through append_transaction and the interest payment
+    handling below.
+
+    Around _STREAM_WINDOW transactions are held back at once, plus up to a
+    block being reconciled, unless an inconsistent transaction is waiting
+    for a matching interest payment."""
+
+    parse_transaction = statement_format.parse_transaction
+
+    # checked once, so rows don't pay for debug logging when it's disabled
+    debug = logger.isEnabledFor(logging.DEBUG)
 
     transactions = []
 
     discontinuous_transaction_index = None     # "gap" into which an interest payment can be moved
     misplaced_interest_transaction = None      # interest payment which needs reordering
 
-    for row in c:
-        if len(row) == 0:
-            # reached end of transactions
-            break
-
-        try:
-            new_transaction = statement_format.parse_transaction(row)
-            logger.debug(f"Parsed transaction: {new_transaction}")
-
-            # first transaction
-            if len(transactions) == 0:
-                transactions.append(new_transaction)
-                continue
-
-            # append, potentially with known adjustments
-            previous_transaction = transactions[-1]
-            if append_transaction(statement_format, transactions, new_transaction):
-                continue
-
-            # out of order transaction
-            #
-            # rather than building arbitrarily complex transaction reordering logic, just cover known cases.
-            #
-            # assumptions:
-            # - the first transaction (chronologically and by statement order) in a statement is consistent
-            # - the statement can be made consistent by reordering and/or redating interest payments
-            # - multiple interest payments that need rearranging will not overlap or affect each other in any way (likely only one per month)
-            #
-            # handle an interest transaction
-            if new_transaction.is_interest():
-                logger.debug("Found an out of order interest transaction")
-
-                # make sure no other interest transactions are being handled
-                if misplaced_interest_transaction is not None:
-                    raise StatementParseError("Encountered an out of order interest transaction while handling another")
-
-                # try inserting if we've stored an index
-                if discontinuous_transaction_index is not None:
-                    if insert_interest_transaction(statement_format, transactions, new_transaction, discontinuous_transaction_index):
-                        discontinuous_transaction_index = None
-                        logger.debug("Successfully inserted out of order interest transaction in stored index")
-                        continue
-                    else:
-                        raise StatementParseError("Out of order interest transaction could not be inserted into expected gap")
-
-                # store for later to see if it can be moved
-                misplaced_interest_transaction = new_transaction
-                logger.debug("Saved an interest transaction to be looked at later")
-
-            # handle a non-interest transaction
-            else:
-                logger.debug("Found an inconsistent transaction")
-
-                # make sure no other inconsistent transactions are being handled
+    def reconcile(new_transaction):
+        nonlocal discontinuous_transaction_index, misplaced_interest_transaction
+
+        # first transaction
+        if len(transactions) == 0:
+            transactions.append(new_transaction)
+            return
+
+        # append, potentially with known adjustments
+        previous_transaction = transactions[-1]
+        if append_transaction(statement_format, transactions, new_transaction):
+            return
+
+        # out of order transaction
+        #
+        # rather than building arbitrarily complex transaction reordering logic, just cover known cases.
+        #
+        # assumptions:
+        # - the first transaction (chronologically and by statement order) in a statement is consistent
+        # - the statement can be made consistent by reordering and/or redating interest payments
+        # - multiple interest payments that need rearranging will not overlap or affect each other in any way (likely only one per month)
+        #
+        # handle an interest transaction
+        if new_transaction.is_interest():
+            logger.debug("Found an out of order interest transaction")
+
+            # make sure no other interest transactions are being handled
+            if misplaced_interest_transaction is not None:
+                raise StatementParseError("Encountered an out of order interest transaction while handling another")
+
+            # try inserting if we've stored an index
+            if discontinuous_transaction_index is not None:
+                if insert_interest_transaction(statement_format, transactions, new_transaction, discontinuous_transaction_index):
+                    discontinuous_transaction_index = None
+                    logger.debug("Successfully inserted out of order interest transaction in stored index")
+                    return
+                else:
+                    raise StatementParseError("Out of order interest transaction could not be inserted into expected gap")
+
+            # store for later to see if it can be moved
+            misplaced_interest_transaction = new_transaction
+            logger.debug("Saved an interest transaction to be looked at later")
+
+        # handle a non-interest transaction
+        else:
+            logger.debug("Found an inconsistent transaction")
+
+            # make sure no other inconsistent transactions are being handled
+            if discontinuous_transaction_index is not None:
+                raise StatementParseError("Encountered an inconsistent non-interest transaction while handling another")
+
+            # try inserting a stored interest transaction if available
+            if misplaced_interest_transaction is not None:
+                # TODO: can this block be factored into append_transaction or some other function?
+                #
+                # redate interest transaction if the date is wrong
+                test_transaction = misplaced_interest_transaction.copy()
+                if not statement_format.date_ordering_is_valid(previous_transaction, test_transaction):
+                    test_transaction = test_transaction.redate(min(previous_transaction.date, new_transaction.date))
+                    STATS.count("interest_redates")
+
+                if statement_format.validate(previous_transaction, test_transaction) and statement_format.validate(test_transaction, new_transaction):
+                    transactions.append(test_transaction)
+                    transactions.append(new_transaction)
+                    misplaced_interest_transaction = None
+                    STATS.count("interest_reorders")
+                    logger.debug("Successfully inserted stored interest transaction with new transaction")
+                    return
+                else:
+                    raise StatementParseError("Inconsistent interest transaction could not be inserted into other transactions")
+
+            # insert anyway and mark for later to see if an interest transaction can be inserted here
+            discontinuous_transaction_index = len(transactions)
+            transactions.append(new_transaction)
+            logger.debug("Saved an index for an upcoming out of order interest transaction")
+
+    rows = iter(rows)
+    finished = False
+    while not finished:
+        # parse a block of rows, holding back any error until the rows before
+        # it have been reconciled
+        block = []
+        error = None
+        for row in itertools.islice(rows, _RECONCILE_BLOCK):
+            if len(row) == 0:
+                # reached end of transactions
+                finished = True
+                break
+            try:
+                block.append(parse_transaction(row))
+            except Exception as e:
+                error = StatementParseError(e)
+                finished = True
+                break
+        else:
+            finished = len(block) < _RECONCILE_BLOCK
+
+        # commit everything that can no longer be affected by reconciliation
+        # append_transaction looks back two transactions, and insert_interest_transaction
+        # needs the transaction before the gap
+        if len(transactions) >= _STREAM_WINDOW:
+            committable = len(transactions) - 2
+            if discontinuous_transaction_index is not None:
+                committable = min(committable, discontinuous_transaction_index - 1)
+            if committable > 0:
+                yield from transactions[:committable]
+                del transactions[:committable]
                 if discontinuous_transaction_index is not None:
-                    raise StatementParseError("Encountered an inconsistent non-interest transaction while handling another")
-
-                # try inserting a stored interest transaction if available
-                if misplaced_interest_transaction is not None:
-                    # TODO: can this block be factored into append_transaction or some other function?
-                    #
-                    # redate interest transaction if the date is wrong
-                    test_transaction = misplaced_interest_transaction.copy()
-                    if not statement_format.date_ordering_is_valid(previous_transaction, test_transaction):
-                        test_transaction = test_transaction.redate(min(previous_transaction.date, new_transaction.date))
-
-                    if statement_format.validate(previous_transaction, test_transaction) and statement_format.validate(test_transaction, new_transaction):
-                        transactions.append(test_transaction)
-                        transactions.append(new_transaction)
-                        misplaced_interest_transaction = None
-                        logger.debug("Successfully inserted stored interest transaction with new transaction")
-                        continue
-                    else:
-                        raise StatementParseError("Inconsistent interest transaction could not be inserted into other transactions")
-
-                # insert anyway and mark for later to see if an interest transaction can be inserted here
-                discontinuous_transaction_index = len(transactions)
-                transactions.append(new_transaction)
-                logger.debug("Saved an index for an upcoming out of order interest transaction")
+                    discontinuous_transaction_index -= committable
 
+        if debug:
+            for new_transaction in block:
+                logger.debug("Parsed transaction: %s", new_transaction)
+
+        breaks = _chain_breaks(statement_format, block)
+        breaks.append(len(block))
+        next_break = 0
+        i = 0
+        try:
+            while i < len(block):
+                # whatever is last may have been redated or held back, so the
+                # first transaction after a break is always checked on its own
+                reconcile(block[i])
+                i += 1
+                if transactions[-1] is not block[i - 1]:
+                    continue
+
+                # everything up to the next break follows on from it
+                while breaks[next_break] < i:
+                    next_break += 1
+                transactions.extend(block[i:breaks[next_break]])
+                i = breaks[next_break]
         except Exception as e:
-            f.close()
             raise StatementParseError(e)
 
-    f.close()
-    logger.debug(f'Reached end of file "{file_basename}"')
+        if error is not None:
+            raise error
 
     # make sure any inconsistent transactions were handled
     if discontinuous_transaction_index is not None:
@@ -361,4 +504,73 @@ def read_nationwide_file(file):
     if misplaced_interest_transaction is not None and not append_transaction(statement_format, transactions, misplaced_interest_transaction):
         raise StatementParseError(f"Could not reconcile inconsistent interest transaction: {misplaced_interest_transaction}")
 
-    return (account_name, statement_format.order(transactions))
+    yield from transactions
+
+def _open_statement_buffer(file_basename, buffer):
+    """Equivalent of _open_statement for a bytes-like buffer containing a
+    statement, returning its statement format, account name and the offset
+    of its transaction data"""
+
+    def next_line(pos):
+        end = buffer.find(b"\n", pos)
+        end = len(buffer) if end == -1 else end + 1
+        return (buffer[pos:end].decode("latin_1"), end)
+
+    statement_format, account_name = sniff_statement(file_basename, buffer[:SNIFF_SIZE])
+    _, pos = next_line(0)
+
+    # skip through lines until we hit the CSV header
+    while (True):
+        line, pos = next_line(pos)
+        if line == "": # EOF
+            raise StatementParseError(f'Could not detect start of transaction data for "{file_basename}"')
+        elif line.strip() == statement_format.header:
+            logger.debug('Detected start of transaction data for "%s"', file_basename)
+            break
+
+    return (statement_format, account_name, pos)
+
+def _iter_statement_transactions(file_basename, rows, statement_format, close=None):
+    try:
+        transactions = _reconcile_transactions(statement_format, rows)
+
+        if statement_format.is_chronological():
+            yield from transactions
+        else:
+            # reverse chronological statements can only be reordered once fully read
+            yield from reversed(list(transactions))
+        logger.debug('Reached end of file "%s"', file_basename)
+    finally:
+        if close is not None:
+            close()
+
+def iter_nationwide_file(file):
+    """Open a statement, returning its account name and an iterator over its
+    transactions in chronological order.
+
+    Statements in chronological order are streamed with bounded look-ahead, so
+    arbitrarily large files can be processed in constant memory. Reverse
+    chronological statements (i.e. Midata) are necessarily read in full before
+    the first transaction is yielded.
+
+    Errors in the statement format are raised immediately, but errors in
+    transaction data are only raised by the iterator when encountered, after
+    any earlier transactions have been yielded."""
+
+    f, statement_format, account_name = _open_statement(file)
+    return (account_name, _iter_statement_transactions(os.path.basename(file), csv.reader(f), statement_format, f.close))
+
+def read_nationwide_file(file):
+    account_name, transactions = iter_nationwide_file(file)
+    return (account_name, list(transactions))
+
+def read_nationwide_bytes(file, data):
+    """Equivalent of read_nationwide_file for a statement which has already
+    been read into memory as bytes. file is only used in messages."""
+
+    file_basename = os.path.basename(file)
+    logger.debug('Reading buffered file "%s"', file_basename)
+
+    statement_format, account_name, pos = _open_statement_buffer(file_basename, data)
+    rows = csv.reader(io.StringIO(data[pos:].decode("latin_1"), newline=""))
+    return (account_name, list(_iter_statement_transactions(file_basename, rows, statement_format)))
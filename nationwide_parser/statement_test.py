@@ -1,8 +1,12 @@
 import os
 import unittest
+from unittest import mock
 
 from nationwide_parser.account import Account
-from nationwide_parser.statement import read_nationwide_file, StatementParseError
+from nationwide_parser.statement import iter_nationwide_file, read_nationwide_file, StatementParseError
+from nationwide_parser.statement import Midata, Nationwide, SNIFF_SIZE, STATEMENT_FORMATS, UnrecognisedFileError, sniff_statement
+from nationwide_parser.statement import _chain_breaks
+from nationwide_parser.synthetic import generate_transactions
 
 
 TEST_DATA_DIR = "fixtures"
@@ -15,6 +19,12 @@ class TestFileParsing(unittest.TestCase):
             result = read_nationwide_file(infile)
             self.assertIsNone(result)
 
+    def test_random_file_is_unrecognised(self):
+        infile = os.path.join(TEST_DATA_DIR, "random-file.txt")
+
+        with self.assertRaises(UnrecognisedFileError):
+            read_nationwide_file(infile)
+
     def test_parse_midata(self):
         infile = os.path.join(TEST_DATA_DIR, "test-midata.csv")
         result = read_nationwide_file(infile)
@@ -73,6 +83,51 @@ class TestFileParsing(unittest.TestCase):
                 result = read_nationwide_file(os.path.join(TEST_DATA_DIR, file))
                 self.assertIsNone(result)
 
+class TestFileStreaming(unittest.TestCase):
+    def test_stream_matches_read(self):
+        for name in ["test-statement.csv", "statement-with-interest.csv", "test-midata.csv", "midata-with-interest.csv"]:
+            infile = os.path.join(TEST_DATA_DIR, name)
+            expected = read_nationwide_file(infile)
+
+            # force transactions to be committed as early as possible
+            with mock.patch("nationwide_parser.statement._STREAM_WINDOW", 1):
+                account_name, transactions = iter_nationwide_file(infile)
+                self.assertEqual(account_name, expected[0])
+                self.assertEqual(list(transactions), expected[1])
+
+    def test_stream_raises_lazily(self):
+        infile = os.path.join(TEST_DATA_DIR, "bad-statement-1.csv")
+
+        account_name, transactions = iter_nationwide_file(infile)
+        with self.assertRaises(StatementParseError):
+            list(transactions)
+
+    def test_block_size_does_not_matter(self):
+        for name in ["test-statement.csv", "statement-with-interest.csv", "test-midata.csv", "midata-with-interest.csv", "bad-statement-1.csv"]:
+            infile = os.path.join(TEST_DATA_DIR, name)
+            try:
+                expected = read_nationwide_file(infile)
+            except StatementParseError as e:
+                expected = str(e)
+
+            for block_size in [1, 2, 3]:
+                with mock.patch("nationwide_parser.statement._RECONCILE_BLOCK", block_size):
+                    try:
+                        result = read_nationwide_file(infile)
+                    except StatementParseError as e:
+                        result = str(e)
+                self.assertEqual(result, expected, name)
+
+class TestChainBreaks(unittest.TestCase):
+    def test_chain_breaks(self):
+        transactions = generate_transactions(10, transactions_per_day=1)
+        del transactions[6]
+        transactions[2], transactions[3] = transactions[3], transactions[2]
+
+        self.assertEqual(_chain_breaks(Nationwide, transactions), [2, 3, 4, 6])
+        self.assertEqual(_chain_breaks(Midata, transactions[::-1]), [3, 5, 6, 7])
+        self.assertEqual(_chain_breaks(Nationwide, transactions[:2]), [])
+
 class TestFileConsistency(unittest.TestCase):
     def test_statement_consistency(self):
         infile = os.path.join(TEST_DATA_DIR, "test-statement.csv")
@@ -87,3 +142,29 @@ class TestFileConsistency(unittest.TestCase):
         account = Account(result[0], result[1])
 
         self.assertTrue(account.all_transactions_are_continuous())
+
+class TestSniffing(unittest.TestCase):
+    def test_registry(self):
+        self.assertEqual(STATEMENT_FORMATS, [Midata, Nationwide])
+
+    def test_statements(self):
+        self.assertEqual(sniff_statement("a", b'"Account Number:","****12345"\r\n\r\n"Date"'), (Midata, "****12345"))
+        self.assertEqual(sniff_statement("a", b'"Account Name:","Foo current ****12345"'), (Nationwide, "****12345"))
+
+        for file in ["test-midata.csv", "test-statement.csv"]:
+            with open(os.path.join(TEST_DATA_DIR, file), "rb") as f:
+                sniff_statement(file, f.read(SNIFF_SIZE))
+
+    def test_unrecognised_files(self):
+        with self.assertRaisesRegex(UnrecognisedFileError, "not a text file"):
+            sniff_statement("a", b'"Account Number:","****12345"\0\r\n')
+        with self.assertRaisesRegex(UnrecognisedFileError, "Could not detect"):
+            sniff_statement("a", b'"Date","Type"\r\n')
+        with self.assertRaisesRegex(UnrecognisedFileError, "Could not detect"):
+            sniff_statement("a", b'"Account Number:","****12345"' + b"x" * SNIFF_SIZE)
+
+    def test_empty_file(self):
+        with self.assertRaisesRegex(StatementParseError, "empty") as cm:
+            sniff_statement("a", b"")
+        self.assertNotIsInstance(cm.exception, UnrecognisedFileError)
+
@@ -0,0 +1,90 @@
+import contextlib
+import time
+
+
+class Stats:
+    """Timers and counters for the stages of a run.
+
+    Timers accumulate the total time and number of calls of a named stage,
+    counters accumulate named counts, and files records (file, rows, seconds)
+    for each statement parsed. Everything is cheap enough to record
+    unconditionally, as nothing is recorded per transaction."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+        self.files = []
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        timer = self.timers.setdefault(name, [0.0, 0])
+        timer[0] += seconds
+        timer[1] += 1
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_file(self, file, rows, seconds):
+        self.files.append((file, rows, seconds))
+
+    def to_dict(self):
+        return {
+                "timers": {name: {"seconds": seconds, "calls": calls} for name, (seconds, calls) in self.timers.items()},
+                "counters": dict(self.counters),
+                "files": [{"file": file, "rows": rows, "seconds": seconds} for file, rows, seconds in self.files],
+                }
+
+    def add_dict(self, stats):
+        """Add figures from the to_dict() of another Stats, such as one
+        recorded in a worker process"""
+
+        for name, timer in stats["timers"].items():
+            total = self.timers.setdefault(name, [0.0, 0])
+            total[0] += timer["seconds"]
+            total[1] += timer["calls"]
+        for name, n in stats["counters"].items():
+            self.count(name, n)
+        for f in stats["files"]:
+            self.add_file(f["file"], f["rows"], f["seconds"])
+
+    def format_table(self, num_files=5):
+        """Render the timers and counters, along with the num_files statements
+        which took longest to parse, as plain text"""
+
+        lines = [f"{'stage':<24} {'seconds':>10} {'calls':>8}"]
+        for name, (seconds, calls) in self.timers.items():
+            lines.append(f"{name:<24} {seconds:>10.4f} {calls:>8}")
+
+        lines.append("")
+        lines.append(f"{'counter':<24} {'count':>10}")
+        for name, n in self.counters.items():
+            lines.append(f"{name:<24} {n:>10}")
+
+        if self.files:
+            lines.append("")
+            lines.append(f"{'slowest files':<40} {'rows':>8} {'rows/s':>12}")
+            for file, rows, seconds in sorted(self.files, key=lambda f: f[2], reverse=True)[:num_files]:
+                lines.append(f"{file:<40} {rows:>8} {rows / seconds if seconds > 0 else 0:>12,.0f}")
+
+        return "\n".join(lines) + "\n"
+
+# stats for the current process
+STATS = Stats()
+
+def collect_stats(func, *args):
+    """Call func(*args) in a worker process, returning its result along with
+    the stats it recorded, to be added to the parent's STATS with add_dict"""
+
+    STATS.reset()
+    result = func(*args)
+    return (result, STATS.to_dict())
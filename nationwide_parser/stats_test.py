@@ -0,0 +1,66 @@
+import os
+import unittest
+
+from nationwide_parser.ingest import read_statements
+from nationwide_parser.stats import STATS, Stats, collect_stats
+
+
+TEST_DATA_DIR = "fixtures"
+
+class TestStats(unittest.TestCase):
+    def test_timers_and_counters(self):
+        stats = Stats()
+        with stats.timer("a"):
+            pass
+        with stats.timer("a"):
+            pass
+        stats.count("b")
+        stats.count("b", 2)
+        stats.add_file("c.csv", 10, 0.5)
+
+        self.assertEqual(stats.timers["a"][1], 2)
+        self.assertEqual(stats.counters, {"b": 3})
+
+        other = Stats()
+        other.add_dict(stats.to_dict())
+        other.add_dict(stats.to_dict())
+        self.assertEqual(other.timers["a"][1], 4)
+        self.assertEqual(other.counters, {"b": 6})
+        self.assertEqual(other.files, [("c.csv", 10, 0.5), ("c.csv", 10, 0.5)])
+
+        table = other.format_table()
+        self.assertIn("c.csv", table)
+        self.assertIn("b ", table)
+
+    def test_collect_stats(self):
+        STATS.count("before")
+        result, stats = collect_stats(STATS.count, "during")
+        self.assertIsNone(result)
+        self.assertEqual(stats["counters"], {"during": 1})
+        STATS.reset()
+
+class TestReadStats(unittest.TestCase):
+    def setUp(self):
+        self.infiles = [os.path.join(TEST_DATA_DIR, f) for f in sorted(os.listdir(TEST_DATA_DIR))]
+        STATS.reset()
+
+    def tearDown(self):
+        STATS.reset()
+
+    def check_stats(self):
+        results = [result for _, result in read_statements(self.infiles, jobs=self.jobs)]
+        num_rows = sum(len(r[1]) for r in results if isinstance(r, tuple))
+
+        self.assertEqual(STATS.counters["rows_parsed"], num_rows)
+        self.assertEqual(STATS.counters["files_skipped"], 1)
+        self.assertEqual(STATS.counters["parse_errors"], 8)
+        self.assertGreater(STATS.counters["interest_redates"], 0)
+        self.assertEqual(len(STATS.files), len(self.infiles) - 9)
+
+    def test_serial(self):
+        self.jobs = 1
+        self.check_stats()
+
+    def test_parallel(self):
+        self.jobs = 2
+        self.check_stats()
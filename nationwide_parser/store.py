@@ -0,0 +1,239 @@
+from array import array
+import bisect
+import datetime
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+
+from nationwide_parser.transaction import Transaction, TransactionTable
+
+
+# Binary store layout, all little endian:
+#
+#   magic "NWAS", u16 version, u32 number of accounts
+#   then for each account:
+#     u16 name length, name (UTF-8)
+#     u32 number of transactions n, u32 number of strings
+#     for each string: u32 length, string (UTF-8)
+#     n x i32 date ordinals
+#     n x i64 amounts
+#     n x i64 closing balances
+#     n x u32 kind string indexes
+#     n x u32 description string indexes
+#
+# Storing each column contiguously means a date range can be loaded by
+# bisecting the dates and reading only that slice of the other columns.
+STORE_MAGIC = b"NWAS"
+STORE_VERSION = 1
+
+_HEADER = struct.Struct("<4sHI")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_COUNTS = struct.Struct("<II")
+
+# (attribute of TransactionTable, array typecode)
+_COLUMNS = [
+        ("dates", "i"),
+        ("amounts", "q"),
+        ("closing_balances", "q"),
+        ("kinds", "I"),
+        ("descriptions", "I"),
+        ]
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+class StoreError(Exception):
+    """Raised when a store can't be read"""
+
+    pass
+
+def _is_sqlite(path):
+    return os.path.splitext(path)[1] in SQLITE_EXTENSIONS
+
+def _little_endian(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+def _write_binary(f, named_transactions):
+    f.write(_HEADER.pack(STORE_MAGIC, STORE_VERSION, len(named_transactions)))
+
+    for name, transactions in named_transactions.items():
+        if not isinstance(transactions, TransactionTable):
+            transactions = TransactionTable(transactions)
+
+        encoded_name = name.encode()
+        f.write(_U16.pack(len(encoded_name)))
+        f.write(encoded_name)
+
+        f.write(_COUNTS.pack(len(transactions), len(transactions.strings)))
+        for string in transactions.strings:
+            encoded_string = string.encode()
+            f.write(_U32.pack(len(encoded_string)))
+            f.write(encoded_string)
+
+        for attribute, _ in _COLUMNS:
+            _little_endian(getattr(transactions, attribute)).tofile(f)
+
+def _read_exactly(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise StoreError(f"Unexpected end of store {f.name}")
+    return data
+
+def _read_column(f, typecode, count):
+    column = array(typecode)
+    column.frombytes(_read_exactly(f, count * column.itemsize))
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+def _read_binary(f, start, end, names):
+    magic, version, num_accounts = _HEADER.unpack(_read_exactly(f, _HEADER.size))
+    if magic != STORE_MAGIC:
+        raise StoreError(f"{f.name} is not a transaction store")
+    if version != STORE_VERSION:
+        raise StoreError(f"{f.name} has unsupported store version {version}")
+
+    named_transactions = {}
+    for _ in range(num_accounts):
+        (name_length,) = _U16.unpack(_read_exactly(f, _U16.size))
+        name = _read_exactly(f, name_length).decode()
+        num_transactions, num_strings = _COUNTS.unpack(_read_exactly(f, _COUNTS.size))
+
+        columns_size = num_transactions * sum(array(typecode).itemsize for _, typecode in _COLUMNS)
+        if names is not None and name not in names:
+            for _ in range(num_strings):
+                (string_length,) = _U32.unpack(_read_exactly(f, _U32.size))
+                f.seek(string_length, os.SEEK_CUR)
+            f.seek(columns_size, os.SEEK_CUR)
+            continue
+
+        strings = []
+        for _ in range(num_strings):
+            (string_length,) = _U32.unpack(_read_exactly(f, _U32.size))
+            strings.append(_read_exactly(f, string_length).decode())
+
+        # find the requested date range from the dates column alone
+        columns_start = f.tell()
+        dates = _read_column(f, "i", num_transactions)
+        lo = 0 if start is None else bisect.bisect_left(dates, start.toordinal())
+        hi = num_transactions if end is None else bisect.bisect_right(dates, end.toordinal())
+        hi = max(lo, hi)
+
+        columns = []
+        column_offset = columns_start
+        for _, typecode in _COLUMNS:
+            itemsize = array(typecode).itemsize
+            if typecode == "i":
+                columns.append(dates[lo:hi])
+            else:
+                f.seek(column_offset + lo * itemsize)
+                columns.append(_read_column(f, typecode, hi - lo))
+            column_offset += num_transactions * itemsize
+        f.seek(column_offset)
+
+        named_transactions[name] = TransactionTable.from_columns(*columns, strings)
+
+    return named_transactions
+
+def _write_sqlite(path, named_transactions):
+    connection = sqlite3.connect(path)
+    with connection:
+        # accounts are listed separately, so ones with no transactions are kept
+        connection.execute("""CREATE TABLE accounts (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+            )""")
+        connection.executemany("INSERT INTO accounts VALUES (?, ?)", ((name, i) for i, name in enumerate(named_transactions)))
+        connection.execute("""CREATE TABLE transactions (
+            account TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            date INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            description TEXT NOT NULL,
+            closing_balance INTEGER NOT NULL,
+            PRIMARY KEY (account, position)
+            )""")
+        connection.execute("CREATE INDEX transactions_by_date ON transactions (account, date)")
+        for name, transactions in named_transactions.items():
+            connection.executemany(
+                    "INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((name, i, t.date.toordinal(), t.amount, t.kind, t.description, t.closing_balance) for i, t in enumerate(transactions)),
+                    )
+    connection.close()
+
+def _read_sqlite(path, start, end, names):
+    query = "SELECT account, date, amount, kind, description, closing_balance FROM transactions WHERE date >= ? AND date <= ?"
+    parameters = [
+            datetime.date.min.toordinal() if start is None else start.toordinal(),
+            datetime.date.max.toordinal() if end is None else end.toordinal(),
+            ]
+    if names is not None:
+        query += f" AND account IN ({', '.join('?' * len(names))})"
+        parameters.extend(names)
+    # rows are inserted account by account, in order
+    query += " ORDER BY rowid"
+
+    named_transactions = {}
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        # accounts with nothing in the date range are still returned, empty
+        for (account,) in connection.execute("SELECT name FROM accounts ORDER BY position"):
+            if names is None or account in names:
+                named_transactions[account] = TransactionTable()
+
+        for account, ordinal, amount, kind, description, closing_balance in connection.execute(query, parameters):
+            named_transactions[account].append(Transaction(datetime.date.fromordinal(ordinal), amount, kind, description, closing_balance))
+    except sqlite3.DatabaseError as e:
+        raise StoreError(f"Could not read {path}: {e}")
+    finally:
+        connection.close()
+
+    return named_transactions
+
+def dump_store(f, named_transactions):
+    """Write a dict of account names to chronological transactions to an
+    open binary file in the binary store format, which read_store can load
+    once saved to a file"""
+
+    _write_binary(f, named_transactions)
+
+def write_store(path, named_transactions):
+    """Save a dict of account names to chronological transactions.
+
+    Paths ending in one of SQLITE_EXTENSIONS are saved as an SQLite database,
+    otherwise the compact binary format is used. The store is written to a
+    temporary file which then replaces path, so it's never left half
+    written."""
+
+    store_dir = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=store_dir, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        if _is_sqlite(path):
+            os.close(fd)
+            os.unlink(tmp_path)
+            _write_sqlite(tmp_path, named_transactions)
+        else:
+            with os.fdopen(fd, "wb") as f:
+                _write_binary(f, named_transactions)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def read_store(path, start=None, end=None, names=None):
+    """Load a dict of account names to TransactionTables from a store written
+    by write_store, optionally only loading transactions dated from start to
+    end inclusive and accounts in names"""
+
+    if _is_sqlite(path):
+        return _read_sqlite(path, start, end, names)
+
+    with open(path, "rb") as f:
+        return _read_binary(f, start, end, names)
@@ -0,0 +1,80 @@
+from datetime import date
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.account import Account, load_accounts, save_accounts
+from nationwide_parser.store import StoreError, read_store, write_store
+from nationwide_parser.synthetic import generate_transactions
+from nationwide_parser.transaction import Transaction, TransactionTable
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.accounts = {
+            "****11111": Account("****11111", generate_transactions(500, seed=1)),
+            "****22222": Account("****22222", TransactionTable(generate_transactions(100, seed=2))),
+            }
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_round_trip(self):
+        for file_name in ["accounts.bin", "accounts.sqlite"]:
+            path = os.path.join(self.output_dir, file_name)
+            save_accounts(path, self.accounts)
+            loaded_accounts = load_accounts(path)
+
+            self.assertEqual(list(loaded_accounts), list(self.accounts))
+            for x in self.accounts:
+                self.assertIsInstance(loaded_accounts[x].transactions, TransactionTable)
+                self.assertEqual(loaded_accounts[x].transactions, self.accounts[x].transactions)
+
+    def test_empty_account(self):
+        self.accounts["****33333"] = Account("****33333", [])
+        for file_name in ["accounts.bin", "accounts.sqlite"]:
+            path = os.path.join(self.output_dir, file_name)
+            save_accounts(path, self.accounts)
+            loaded_accounts = load_accounts(path)
+
+            self.assertEqual(list(loaded_accounts), list(self.accounts), file_name)
+            self.assertEqual(loaded_accounts["****33333"].transactions, [])
+
+    def test_date_range(self):
+        transactions = self.accounts["****11111"].transactions
+        start = transactions[100].date
+        end = transactions[200].date
+        expected = [t for t in transactions if start <= t.date <= end]
+
+        for file_name in ["accounts.bin", "accounts.sqlite"]:
+            path = os.path.join(self.output_dir, file_name)
+            save_accounts(path, self.accounts)
+
+            account = Account.load(path, "****11111", start, end)
+            self.assertEqual(account.transactions, expected)
+
+            account = Account.load(path, "****22222", date(2000, 1, 1), date(2000, 1, 2))
+            self.assertEqual(account.transactions, [])
+
+    def test_single_account(self):
+        path = os.path.join(self.output_dir, "account.bin")
+        self.accounts["****22222"].save(path)
+
+        self.assertEqual(list(read_store(path)), ["****22222"])
+        with self.assertRaises(KeyError):
+            Account.load(path, "****11111")
+
+    def test_not_a_store(self):
+        path = os.path.join(self.output_dir, "random.bin")
+        with open(path, "wb") as f:
+            f.write(b"not a store at all")
+
+        with self.assertRaises(StoreError):
+            read_store(path)
+
+    def test_unicode_strings(self):
+        path = os.path.join(self.output_dir, "accounts.bin")
+        write_store(path, {"****33333": [Transaction(date(2025, 1, 1), 100, "Café", "£ refund", 100)]})
+        self.assertEqual(read_store(path)["****33333"][0].description, "£ refund")
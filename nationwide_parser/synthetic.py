@@ -0,0 +1,132 @@
+import calendar
+import datetime
+import random
+
+from nationwide_parser.transaction import Transaction
+
+
+_DESCRIPTIONS = [
+        ("Visa purchase", "ABC SUPERMARKET"),
+        ("Visa purchase", "ABC RESTAURANT"),
+        ("Contactless Payment", "A COFFEE SHOP GB"),
+        ("Direct debit ABC WATER BILL", "ABC WATER BILL"),
+        ("Payment to", "ABC GARAGE"),
+        ("Transfer to", "012345 09876543"),
+        ("Transfer from JOHN SMITH", "012345 12345678"),
+        ("Visa Credit", "ABC SUPERMARKET"),
+        ]
+
+def generate_transactions(num_transactions, start_date=datetime.date(2015, 1, 1), opening_balance=100000, transactions_per_day=3, seed=0):
+    """Generate a consistent chronological list of transactions, with an
+    interest payment at the start of each month.
+
+    Interest payments are dated as they would be after reconciliation, i.e.
+    on the date of the transaction before them, and are always followed by
+    another transaction in the same month."""
+
+    rng = random.Random(seed)
+    transactions = []
+    balance = opening_balance
+    date = start_date
+    month = (date.year, date.month)
+    interest_due = False
+
+    while len(transactions) < num_transactions:
+        for _ in range(rng.randint(1, 2 * transactions_per_day - 1)):
+            if len(transactions) >= num_transactions:
+                break
+
+            kind, description = rng.choice(_DESCRIPTIONS)
+            amount = rng.randint(1, 20000)
+            if kind not in ("Visa Credit", "Transfer from JOHN SMITH"):
+                amount = -amount
+            balance += amount
+            transactions.append(Transaction(date, amount, kind, description, balance))
+
+            # interest for last month is paid after the first transaction of the month
+            if interest_due and len(transactions) < num_transactions - 1:
+                amount = rng.randint(1, 500)
+                balance += amount
+                transactions.append(Transaction(date, amount, "Interest added", "Credit ** Interest ****", balance))
+                interest_due = False
+
+        date += datetime.timedelta(days=rng.randint(1, 2))
+        if (date.year, date.month) != month:
+            month = (date.year, date.month)
+            interest_due = True
+
+    return transactions
+
+def day_start(transactions, i):
+    """Move an index into chronological transactions back to the first
+    transaction on its day, for splitting them into statements, which always
+    start with a complete day"""
+
+    while i > 0 and transactions[i - 1].date == transactions[i].date:
+        i -= 1
+    return i
+
+def _nominal_interest_date(date):
+    """Interest is labelled with the last day of the month it's paid for"""
+
+    last_month = date.replace(day=1) - datetime.timedelta(days=1)
+    return last_month.replace(day=calendar.monthrange(last_month.year, last_month.month)[1])
+
+def _statement_order(transactions, seed):
+    """Reproduce the quirks of interest payments in real statements: they are
+    labelled with a nominal date, and are sometimes listed before the
+    transaction which preceded them"""
+
+    rng = random.Random(seed)
+    listed = []
+    for t in transactions:
+        if t.is_interest():
+            t = t.redate(_nominal_interest_date(t.date))
+            if rng.random() < 0.5 and len(listed) > 1:
+                listed.insert(-1, t)
+                continue
+        listed.append(t)
+    return listed
+
+def _format_pounds(pennies, signed=False):
+    if pennies < 0:
+        sign = "-"
+    elif signed:
+        sign = "+"
+    else:
+        sign = ""
+    return f"{sign}£{abs(pennies) // 100}.{abs(pennies) % 100:02}"
+
+def write_nationwide_statement(file, account_name, transactions, seed=0):
+    """Write chronological transactions as a Nationwide statement"""
+
+    lines = [
+            f'"Account Name:","Synthetic current {account_name}"',
+            f'"Account Balance:","{_format_pounds(transactions[-1].closing_balance)}"',
+            f'"Available Balance: ","{_format_pounds(transactions[-1].closing_balance)}"',
+            "",
+            '"Date","Transaction type","Description","Paid out","Paid in","Balance"',
+            ]
+    for t in _statement_order(transactions, seed):
+        paid_out = _format_pounds(-t.amount) if t.amount < 0 else ""
+        paid_in = _format_pounds(t.amount) if t.amount > 0 else ""
+        lines.append(f'"{t.date.strftime("%d %b %Y")}","{t.kind}","{t.description}","{paid_out}","{paid_in}","{_format_pounds(t.closing_balance)}"')
+
+    with open(file, "w", encoding="latin_1", newline="\r\n") as f:
+        f.write("\n".join(lines) + "\n")
+
+def write_midata_statement(file, account_name, transactions, seed=0):
+    """Write chronological transactions as a Midata statement"""
+
+    lines = [
+            f'"Account Number:","{account_name}"',
+            "",
+            '"Date","Type","Merchant/Description","Debit/Credit","Balance"',
+            ]
+    for t in reversed(_statement_order(transactions, seed)):
+        lines.append(f'"{t.date.strftime("%d/%m/%Y")}","{t.kind}","{t.description}","{_format_pounds(t.amount, signed=True)}","{_format_pounds(t.closing_balance)}"')
+    lines.append("")
+    lines.append(f'"Arranged Overdraft Limit","{transactions[-1].date.strftime("%d/%m/%Y")}","£0.00"')
+
+    with open(file, "w", encoding="latin_1", newline="\r\n") as f:
+        f.write("\n".join(lines) + "\n")
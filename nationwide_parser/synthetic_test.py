@@ -0,0 +1,40 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.account import Account
+from nationwide_parser.statement import read_nationwide_file
+from nationwide_parser.synthetic import day_start, generate_transactions, write_midata_statement, write_nationwide_statement
+
+
+class TestSyntheticStatements(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.transactions = generate_transactions(1000, seed=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_generated_transactions(self):
+        self.assertEqual(len(self.transactions), 1000)
+        self.assertTrue(Account("****12345", self.transactions).all_transactions_are_continuous())
+        self.assertTrue(any(t.is_interest() for t in self.transactions))
+
+    def test_day_start(self):
+        for i in range(len(self.transactions)):
+            start = day_start(self.transactions, i)
+            self.assertEqual(self.transactions[start].date, self.transactions[i].date)
+            self.assertTrue(start == 0 or self.transactions[start - 1].date < self.transactions[start].date)
+
+    def test_nationwide_round_trip(self):
+        infile = os.path.join(self.output_dir, "statement.csv")
+        for seed in range(5):
+            write_nationwide_statement(infile, "****12345", self.transactions, seed)
+            self.assertEqual(read_nationwide_file(infile), ("****12345", self.transactions))
+
+    def test_midata_round_trip(self):
+        infile = os.path.join(self.output_dir, "midata.csv")
+        for seed in range(5):
+            write_midata_statement(infile, "****12345", self.transactions, seed)
+            self.assertEqual(read_nationwide_file(infile), ("****12345", self.transactions))
@@ -1,11 +1,18 @@
+from array import array
+from collections.abc import MutableSequence, Sequence
 from dataclasses import dataclass
 import datetime
 import copy
+import functools
 
-from nationwide_parser.utils import decimalise
+from nationwide_parser.utils import decimalise, isoformat
 
 
-@dataclass
+# accounts balancing each transaction in a ledger
+EXPENSES = "Expenses:Unknown"
+INCOME = "Income:Unknown"
+
+@dataclass(slots=True)
 class Transaction:
     date: datetime.date
     amount: int # pennies
@@ -49,12 +56,154 @@ class Transaction:
         return redated
 
     def to_beancount(self, acct_name):
-        EXPENSES    = "Expenses:Unknown"
-        INCOME      = "Income:Unknown"
-
         income = INCOME if self.amount > 0 else EXPENSES
-        beancount_str = f"""{self.date.isoformat()} * "{self.description}" ""
-  {acct_name} {decimalise(self.amount)} GBP
-  {income} {decimalise(-self.amount)} GBP
+        amount = decimalise(self.amount)
+        # the balancing posting is just the same amount with the sign flipped
+        if self.amount > 0:
+            balancing_amount = f"-{amount}"
+        elif self.amount < 0:
+            balancing_amount = amount[1:]
+        else:
+            balancing_amount = amount
+
+        beancount_str = f"""{isoformat(self.date)} * "{self.description}" ""
+  {acct_name} {amount} GBP
+  {income} {balancing_amount} GBP
 """
         return beancount_str
+
+
+@functools.lru_cache(maxsize=4096)
+def _date_from_ordinal(ordinal):
+    return datetime.date.fromordinal(ordinal)
+
+class TransactionTable(MutableSequence):
+    """A compact, column-oriented list of Transactions.
+
+    Dates are stored as ordinals and amounts/balances as 64-bit integers in
+    arrays, with kind and description strings interned into a shared string
+    table. Indexing builds a new Transaction from the stored columns, so
+    modifying it does not affect the table - assign it back instead."""
+
+    def __init__(self, transactions=()):
+        self.dates = array("i")                 # proleptic Gregorian ordinals
+        self.amounts = array("q")
+        self.closing_balances = array("q")
+        self.kinds = array("I")                 # indexes into self.strings
+        self.descriptions = array("I")
+        self.strings = []
+        self._string_indexes = {}
+
+        self.extend(transactions)
+
+    @classmethod
+    def from_columns(cls, dates, amounts, closing_balances, kinds, descriptions, strings):
+        """Build a table directly from its column arrays and string table"""
+
+        table = cls()
+        table.dates = dates
+        table.amounts = amounts
+        table.closing_balances = closing_balances
+        table.kinds = kinds
+        table.descriptions = descriptions
+        table.strings = strings
+        table._string_indexes = {string: i for i, string in enumerate(strings)}
+        return table
+
+    def __repr__(self):
+        return f"TransactionTable({list(self)})"
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def _intern(self, string):
+        index = self._string_indexes.get(string)
+        if index is None:
+            index = len(self.strings)
+            self.strings.append(string)
+            self._string_indexes[string] = index
+        return index
+
+    def _build(self, i):
+        return Transaction(
+                _date_from_ordinal(self.dates[i]),
+                self.amounts[i],
+                self.strings[self.kinds[i]],
+                self.strings[self.descriptions[i]],
+                self.closing_balances[i],
+                )
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return TransactionTable(self._build(x) for x in range(*i.indices(len(self))))
+        return self._build(i)
+
+    def __setitem__(self, i, transaction):
+        if isinstance(i, slice):
+            transactions = list(self)
+            transactions[i] = transaction
+            self.clear()
+            self.extend(transactions)
+            return
+
+        self.dates[i] = transaction.date.toordinal()
+        self.amounts[i] = transaction.amount
+        self.closing_balances[i] = transaction.closing_balance
+        self.kinds[i] = self._intern(transaction.kind)
+        self.descriptions[i] = self._intern(transaction.description)
+
+    def __delitem__(self, i):
+        del self.dates[i]
+        del self.amounts[i]
+        del self.closing_balances[i]
+        del self.kinds[i]
+        del self.descriptions[i]
+
+    def __iter__(self):
+        strings = self.strings
+        for ordinal, amount, kind, description, closing_balance in zip(self.dates, self.amounts, self.kinds, self.descriptions, self.closing_balances):
+            yield Transaction(_date_from_ordinal(ordinal), amount, strings[kind], strings[description], closing_balance)
+
+    def insert(self, i, transaction):
+        self.dates.insert(i, transaction.date.toordinal())
+        self.amounts.insert(i, transaction.amount)
+        self.closing_balances.insert(i, transaction.closing_balance)
+        self.kinds.insert(i, self._intern(transaction.kind))
+        self.descriptions.insert(i, self._intern(transaction.description))
+
+    def append(self, transaction):
+        self.dates.append(transaction.date.toordinal())
+        self.amounts.append(transaction.amount)
+        self.closing_balances.append(transaction.closing_balance)
+        self.kinds.append(self._intern(transaction.kind))
+        self.descriptions.append(self._intern(transaction.description))
+
+    def extend(self, transactions):
+        if transactions is self:
+            transactions = list(transactions)
+        for t in transactions:
+            self.append(t)
+
+    def clear(self):
+        self.__init__()
+
+def transaction_columns(transactions):
+    """Return parallel (dates, amounts, closing_balances) sequences for a list
+    of transactions, for checks which only need to compare these.
+
+    Dates are only guaranteed to be mutually comparable: they are ordinals for
+    a TransactionTable and datetime.dates otherwise."""
+
+    if isinstance(transactions, TransactionTable):
+        return (transactions.dates, transactions.amounts, transactions.closing_balances)
+
+    return (
+            [t.date for t in transactions],
+            [t.amount for t in transactions],
+            [t.closing_balance for t in transactions],
+            )
@@ -0,0 +1,72 @@
+from datetime import date
+import pickle
+import unittest
+
+from nationwide_parser.transaction import Transaction, TransactionTable, transaction_columns
+from nationwide_parser.utils import decimalise
+
+
+class TestTransaction(unittest.TestCase):
+    def test_decimalise(self):
+        for quantity, expected in [(0, "0.00"), (5, "0.05"), (-5, "-0.05"), (100, "1.00"), (-12345, "-123.45"), (100000007, "1000000.07")]:
+            self.assertEqual(decimalise(quantity), expected)
+
+    def test_to_beancount(self):
+        self.assertEqual(Transaction(date(2025, 2, 1), -12345, "abc", "xyz", 0).to_beancount("Assets:1"), '2025-02-01 * "xyz" ""\n  Assets:1 -123.45 GBP\n  Expenses:Unknown 123.45 GBP\n')
+        self.assertEqual(Transaction(date(2025, 2, 1), 5, "abc", "xyz", 0).to_beancount("Assets:1"), '2025-02-01 * "xyz" ""\n  Assets:1 0.05 GBP\n  Income:Unknown -0.05 GBP\n')
+        self.assertEqual(Transaction(date(2025, 2, 1), 0, "abc", "xyz", 0).to_beancount("Assets:1"), '2025-02-01 * "xyz" ""\n  Assets:1 0.00 GBP\n  Expenses:Unknown 0.00 GBP\n')
+
+class TestTransactionTable(unittest.TestCase):
+    def setUp(self):
+        self.transactions = [
+            Transaction(date(2025, 2, 1), 1, "abc", "xyz", 1001),
+            Transaction(date(2025, 2, 2), 99, "abc", "uvw", 1100),
+            Transaction(date(2025, 2, 4), -600, "def", "xyz", 500),
+            ]
+        self.table = TransactionTable(self.transactions)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(list(self.table), self.transactions)
+        self.assertEqual(self.table, self.transactions)
+        self.assertEqual(self.table[1], self.transactions[1])
+        self.assertEqual(self.table[-1], self.transactions[-1])
+        self.assertEqual(self.table[1:], self.transactions[1:])
+
+    def test_strings_interned(self):
+        self.assertEqual(sorted(self.table.strings), ["abc", "def", "uvw", "xyz"])
+
+    def test_mutation(self):
+        new_transaction = Transaction(date(2025, 2, 3), 100, "abc", "new", 1200)
+        self.table.insert(2, new_transaction)
+        self.transactions.insert(2, new_transaction)
+        self.assertEqual(self.table, self.transactions)
+
+        self.table[0] = self.table[0].redate(date(2025, 1, 1))
+        self.transactions[0] = self.transactions[0].redate(date(2025, 1, 1))
+        self.assertEqual(self.table, self.transactions)
+
+        del self.table[1:3]
+        del self.transactions[1:3]
+        self.assertEqual(self.table, self.transactions)
+
+        self.table.extend(self.table)
+        self.assertEqual(self.table, self.transactions * 2)
+
+    def test_views_are_copies(self):
+        self.table[0].amount = 5
+        self.assertEqual(self.table[0].amount, 1)
+
+    def test_empty(self):
+        self.assertEqual(TransactionTable(), [])
+        self.assertNotEqual(self.table, [])
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.table)), self.transactions)
+
+    def test_columns(self):
+        for transactions in (self.table, self.transactions):
+            dates, amounts, closing_balances = transaction_columns(transactions)
+            self.assertLess(dates[0], dates[1])
+            self.assertEqual(list(amounts), [1, 99, -600])
+            self.assertEqual(list(closing_balances), [1001, 1100, 500])
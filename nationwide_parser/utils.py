@@ -1,10 +1,32 @@
+import functools
+import hashlib
+
+
+# the two digit pence of every amount, so they don't need formatting each time
+_PENCE = [f"{pence:02}" for pence in range(100)]
+
 def decimalise(quantity):
     """Format an int penny quantity into (-)£PPP.pp"""
 
     if quantity < 0:
-        prefix = "-"
-    else:
-        prefix = ""
-    quantity = abs(quantity)
+        pounds, pence = divmod(-quantity, 100)
+        return f"-{pounds}.{_PENCE[pence]}"
+
+    pounds, pence = divmod(quantity, 100)
+    return f"{pounds}.{_PENCE[pence]}"
+
+@functools.lru_cache(maxsize=4096)
+def isoformat(date):
+    """Return date.isoformat(), cached as ledgers repeat the same dates many
+    times over"""
+
+    return date.isoformat()
+
+def hash_file(file):
+    """Return the SHA-256 hex digest of a file's contents"""
 
-    return f"{prefix}{quantity // 100}.{quantity % 100:02}"
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,124 @@
+import logging
+import time
+
+from nationwide_parser.account import Account, InconsistentTransactionsError, save_accounts
+from nationwide_parser.ingest import find_duplicate_files, read_statements, scan_statements
+from nationwide_parser.ledger import DEFAULT_BUFFER_SIZE, RenderCache, update_ledger
+from nationwide_parser.statement import UnrecognisedFileError
+from nationwide_parser.stats import STATS
+from nationwide_parser.transaction import TransactionTable
+
+
+logger = logging.getLogger(__name__)
+
+# seconds between polls for new statements
+DEFAULT_INTERVAL = 0.5
+
+class StatementWatcher:
+    """Polls paths for statements which have appeared or changed since the
+    last poll, comparing the sizes and modification times of files"""
+
+    def __init__(self, paths, recursive=False, include=(), exclude=()):
+        self.paths = paths
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self._seen = {}
+
+    def poll(self):
+        """Return files which are new or have changed since the last poll, in
+        the order they're listed. The first poll returns every file."""
+
+        snapshot = scan_statements(self.paths, self.recursive, self.include, self.exclude)
+        changed = [f for f, signature in snapshot.items() if self._seen.get(f) != signature]
+        self._seen = snapshot
+        return changed
+
+def ingest_statements(accounts, files, jobs=1, prefetch=0, compact=False):
+    """Read statements and merge them into a dict of resident Accounts,
+    returning how many transactions were added to each account.
+
+    Statements which can't be read or merged are logged and skipped rather
+    than raised, so one bad download can't stop a long running watch. Copies
+    of other files, and statements already in their accounts, are skipped
+    without merging them."""
+
+    duplicates = find_duplicate_files(files)
+    if duplicates:
+        for duplicate, original in duplicates.items():
+            logger.info(f"Skipping {duplicate}, which is identical to {original}")
+        STATS.count("duplicate_files", len(duplicates))
+        files = [f for f in files if f not in duplicates]
+
+    num_added = {}
+    for file, result in read_statements(files, jobs, None, prefetch):
+        if isinstance(result, UnrecognisedFileError):
+            logger.debug(f"Skipping {file}: {result}")
+            continue
+        elif isinstance(result, OSError):
+            # e.g. a partial download renamed once complete
+            logger.warning(f"Skipping {file}, which could not be read: {result}")
+            continue
+        elif isinstance(result, Exception):
+            logger.warning(result)
+            continue
+
+        account_name, transactions = result
+        if compact:
+            transactions = TransactionTable(transactions)
+
+        if account_name in accounts and accounts[account_name].covers(transactions):
+            logger.info(f"Skipping {file}, which is already in account {account_name}")
+            STATS.count("statements_covered")
+            continue
+        elif account_name in accounts:
+            try:
+                added = accounts[account_name].add_unique_transactions(transactions)
+            except InconsistentTransactionsError as e:
+                logger.warning(f"Could not merge {file} into account {account_name}: {e}")
+                continue
+        else:
+            accounts[account_name] = Account(account_name, transactions)
+            added = len(transactions)
+
+        logger.info(f"Read {len(transactions)} transactions for account {account_name} from {file}, {added} of them new")
+        if added > 0:
+            num_added[account_name] = num_added.get(account_name, 0) + added
+    return num_added
+
+def watch_statements(watcher, accounts, ledger_file, interval=DEFAULT_INTERVAL, jobs=1, prefetch=0, compact=False, buffer_size=DEFAULT_BUFFER_SIZE, store=None, render_cache=None, polls=None):
+    """Keep accounts resident and poll watcher for new statements every
+    interval seconds, merging them in and bringing ledger_file up to date
+    with update_ledger, which only appends to the affected accounts unless
+    their earlier history has changed. The store is saved too if given.
+
+    Accounts are rendered through render_cache, a RenderCache which is
+    created if not given, so their history is only formatted once however
+    often the ledger is rewritten.
+
+    Runs until interrupted, or for polls polls if given."""
+
+    if render_cache is None:
+        render_cache = RenderCache()
+
+    num_polls = 0
+    while polls is None or num_polls < polls:
+        time.sleep(interval)
+        num_polls += 1
+
+        files = watcher.poll()
+        if not files:
+            continue
+
+        logger.debug(f"Found new or changed statements {files}")
+        with STATS.timer("watch_ingest"):
+            num_added = ingest_statements(accounts, files, jobs, prefetch, compact)
+        if not num_added:
+            continue
+
+        with STATS.timer("write"):
+            update_ledger(ledger_file, accounts, buffer_size=buffer_size, render_cache=render_cache)
+        if store is not None:
+            with STATS.timer("store_save"):
+                save_accounts(store, accounts)
+        logger.info(f"Updated {ledger_file} with {sum(num_added.values())} new transactions in {', '.join(num_added)}")
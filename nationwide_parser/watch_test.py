@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from nationwide_parser.ledger import render_account
+from nationwide_parser.synthetic import day_start, generate_transactions, write_nationwide_statement
+from nationwide_parser.watch import StatementWatcher, ingest_statements, watch_statements
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.ledger = os.path.join(self.root, "ledger.beancount")
+        self.statements = os.path.join(self.root, "statements")
+        os.mkdir(self.statements)
+
+        self.transactions = generate_transactions(200)
+        self.split = day_start(self.transactions, 120)
+        self.overlap = day_start(self.transactions, 110)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write_statement(self, name, transactions):
+        write_nationwide_statement(os.path.join(self.statements, name), "****0001", transactions)
+
+    def test_poll(self):
+        watcher = StatementWatcher([self.statements])
+        self.assertEqual(watcher.poll(), [])
+
+        self.write_statement("first.csv", self.transactions[:self.split])
+        self.assertEqual(watcher.poll(), [os.path.join(self.statements, "first.csv")])
+        self.assertEqual(watcher.poll(), [])
+
+        self.write_statement("first.csv", self.transactions[:self.split + 1])
+        self.assertEqual(watcher.poll(), [os.path.join(self.statements, "first.csv")])
+
+    def test_watch_statements(self):
+        self.write_statement("first.csv", self.transactions[:self.split])
+        watcher = StatementWatcher([self.statements])
+        accounts = {}
+        ingest_statements(accounts, watcher.poll())
+        self.assertEqual(accounts["****0001"].transactions, self.transactions[:self.split])
+
+        # nothing new, so the ledger isn't written
+        watch_statements(watcher, accounts, self.ledger, interval=0, polls=1)
+        self.assertFalse(os.path.exists(self.ledger))
+
+        # an overlapping statement arrives
+        self.write_statement("second.csv", self.transactions[self.overlap:])
+        watch_statements(watcher, accounts, self.ledger, interval=0, polls=1)
+        self.assertEqual(accounts["****0001"].transactions, self.transactions)
+        with open(self.ledger) as f:
+            self.assertIn(render_account(accounts["****0001"]), f.read())
+
+    def test_bad_statement(self):
+        self.write_statement("first.csv", self.transactions)
+        with open(os.path.join(self.statements, "bad.csv"), "w") as f:
+            f.write('"Account Name:","Synthetic current ****0001"\nnot a statement\n')
+
+        accounts = {}
+        with self.assertLogs("nationwide_parser.watch", "WARNING"):
+            num_added = ingest_statements(accounts, StatementWatcher([self.statements]).poll())
+        self.assertEqual(num_added, {"****0001": len(self.transactions)})
+
+    def test_file_renamed_after_poll(self):
+        for prefetch in [0, 2]:
+            for name in os.listdir(self.statements):
+                os.remove(os.path.join(self.statements, name))
+            self.write_statement("first.csv", self.transactions)
+            self.write_statement("second.csv.crdownload", self.transactions[:self.split])
+            files = StatementWatcher([self.statements]).poll()
+
+            # the download completes after the directory was polled
+            downloading = os.path.join(self.statements, "second.csv.crdownload")
+            os.rename(downloading, os.path.join(self.statements, "second.csv"))
+
+            accounts = {}
+            with self.assertLogs("nationwide_parser.watch", "WARNING") as logs:
+                num_added = ingest_statements(accounts, files, prefetch=prefetch)
+            self.assertEqual(num_added, {"****0001": len(self.transactions)})
+            self.assertIn("could not be read", logs.output[0])
+
+    def test_skip_duplicates(self):
+        self.write_statement("first.csv", self.transactions[:self.split])
+        self.write_statement("first (1).csv", self.transactions[:self.split])
+        watcher = StatementWatcher([self.statements])
+        accounts = {}
+        with self.assertLogs("nationwide_parser.watch", "INFO") as logs:
+            ingest_statements(accounts, watcher.poll())
+        self.assertEqual(accounts["****0001"].transactions, self.transactions[:self.split])
+        self.assertEqual(sum("identical" in line for line in logs.output), 1)
+
+        # a statement covered by what's been merged already
+        self.write_statement("part.csv", self.transactions[self.overlap:self.split])
+        with self.assertLogs("nationwide_parser.watch", "INFO") as logs:
+            self.assertEqual(ingest_statements(accounts, watcher.poll()), {})
+        self.assertIn("already in account", logs.output[0])